@@ -10,15 +10,45 @@ import face_recognition
 import json
 import os
 import logging
+import atexit
+from logging.handlers import QueueHandler, QueueListener
+import queue
 import sys
 import traceback
 from datetime import datetime
 from typing import List, Tuple, Dict, Optional
 import math
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 import statistics
 import threading
 import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from encoding_cache import save_encoding_cache, load_encoding_cache, cached_encoding_counts
+from file_utils import atomic_write_json
+from fast_match import quantize_int8, int8_shortlist, calibration_stats, build_l2_index, l2_128
+
+def _encode_one(image_path: str) -> Tuple[Optional[np.ndarray], str, int]:
+    """Encode the largest face in one image (module-level so worker processes can pickle it)"""
+    image = cv2.imread(image_path)
+    if image is None:
+        return None, 'unreadable', 0
+    
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    face_locations = face_recognition.face_locations(rgb_image, model="hog")
+    
+    if not face_locations:
+        return None, 'no_face', 0
+    
+    face_count = len(face_locations)
+    if face_count > 1:
+        # Use the largest face
+        face_locations = [max(face_locations, key=lambda loc: (loc[2]-loc[0])*(loc[1]-loc[3]))]
+    
+    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    if not face_encodings:
+        return None, 'no_encoding', face_count
+    
+    return face_encodings[0], 'ok', face_count
 
 class AdvancedFaceRecognition:
     def __init__(self, json_folder="json_data"):
@@ -30,6 +60,12 @@ class AdvancedFaceRecognition:
         # Enhanced parameters
         self.face_detection_models = ["hog", "cnn"]
         self.current_model = "hog"  # Start with faster model
+        self.detect_scale = 0.5  # Fraction of the frame size used for face detection
+        self.min_detect_scale = 0.25
+        
+        # Per-frame buffers reused across recognize_faces calls
+        self._rgb_buf = None
+        self._small_buf = None
         
         # Dynamic thresholds (will be auto-calibrated)
         self.face_distance_threshold = 0.4
@@ -42,15 +78,52 @@ class AdvancedFaceRecognition:
         self.blur_threshold = 100
         self.brightness_range = (50, 200)
         
+        # Encodings closer than this to an already stored one are dropped at save time.
+        # Smaller libraries match faster; 0 keeps every encoding.
+        self.dedup_threshold = 0.1
+        
+        # Int8 coarse matching: shortlist candidates on int8 codes, re-rank in float32.
+        # Only pays off with an int8-capable BLAS backend, so it is opt-in.
+        self.quantized_matching = False
+        self.rerank_candidates = 8
+        
         # Performance tracking
         self.recognition_stats = {
             'total_attempts': 0,
             'successful_recognitions': 0,
             'false_positives': 0,
-            'processing_times': [],
-            'confidence_scores': []
+            'processing_times': deque(maxlen=1024),
+            'confidence_scores': deque(maxlen=1024)
         }
         
+        # Running totals so summaries stay O(1) however long the session runs
+        self._time_sum = 0.0
+        self._time_count = 0
+        self._time_max = 0.0
+        self._confidence_sum = 0.0
+        self._confidence_count = 0
+        self._confidence_min = float('inf')
+        self._recent_times = deque(maxlen=10)
+        
+        # Top-1 match per quantized probe - the same person yields near-identical encodings frame after frame
+        self._recog_cache = OrderedDict()
+        self.recog_cache_size = 512
+        self.recognition_stats['cache_hits'] = 0
+        self.recognition_stats['cache_misses'] = 0
+        
+        # Guards publishing the gallery so a recognize call never sees a half-appended set
+        self._known_lock = threading.Lock()
+        # Per-thread output buffer for the single-probe distance kernel
+        self._match_local = threading.local()
+        
+        # Incremental enrollment re-calibrates in the background every N appended students
+        self.calibrate_every = 5
+        self._appends_since_calibration = 0
+        
+        # Async pipeline: one worker thread plus a single-slot queue so stale frames are dropped
+        self._async_executor = None
+        self._async_slot = queue.Queue(maxsize=1)
+        
         self.load_encodings()
         self.logger.info("🚀 Advanced Face Recognition System Initialized")
         
@@ -88,9 +161,16 @@ class AdvancedFaceRecognition:
         error_formatter = logging.Formatter('🚨 ERROR: %(message)s')
         error_handler.setFormatter(error_formatter)
         
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-        self.logger.addHandler(error_handler)
+        # Hand records to a background listener so file/console writes stay off the hot path
+        self.stop_logging()
+        log_queue = queue.Queue(-1)
+        self._log_listener = QueueListener(log_queue, file_handler, console_handler, error_handler,
+                                           respect_handler_level=True)
+        self._log_listener.start()
+        # The listener thread is a daemon - flush what is still queued when the interpreter exits
+        atexit.unregister(self.stop_logging)
+        atexit.register(self.stop_logging)
+        self.logger.addHandler(QueueHandler(log_queue))
         
         # Set up root logger to catch all messages
         root_logger = logging.getLogger()
@@ -98,6 +178,12 @@ class AdvancedFaceRecognition:
             root_logger.addHandler(console_handler)
             root_logger.setLevel(logging.INFO)
         
+    def stop_logging(self):
+        """Write out any queued log records and stop the background listener"""
+        listener, self._log_listener = getattr(self, '_log_listener', None), None
+        if listener:
+            listener.stop()
+    
     def setup_directories(self):
         """Setup directory structure"""
         os.makedirs(self.json_folder, exist_ok=True)
@@ -111,33 +197,40 @@ class AdvancedFaceRecognition:
             encodings_file = os.path.join(self.json_folder, 'encodings.json')
             students_file = os.path.join(self.json_folder, 'students.json')
             
-            self.known_encodings = []
-            self.known_names = []
-            self.known_rolls = []
-            self.known_metadata = []
+            names, rolls, metadata = [], [], []
+            encoding_blocks = []
             
-            if os.path.exists(encodings_file) and os.path.exists(students_file):
-                with open(encodings_file, 'r') as f:
-                    encodings_data = json.load(f)
-                
+            # Prefer the memory-mapped .npy cache, fall back to parsing JSON
+            cache = load_encoding_cache(self.json_folder)
+            
+            if os.path.exists(students_file) and (cache is not None or os.path.exists(encodings_file)):
                 with open(students_file, 'r') as f:
                     students_data = json.load(f)
                 
+                if cache is not None:
+                    matrix, offsets = cache
+                    encodings_data = {roll: matrix[start:start + count] for roll, (start, count) in offsets.items()}
+                else:
+                    with open(encodings_file, 'r') as f:
+                        encodings_data = json.load(f)
+                
                 total_encodings = 0
                 for roll_number, encodings_list in encodings_data.items():
                     if roll_number in students_data:
                         student_info = students_data[roll_number]
+                        count = len(encodings_list)
                         
-                        for i, encoding in enumerate(encodings_list):
-                            self.known_encodings.append(np.array(encoding))
-                            self.known_names.append(student_info['name'])
-                            self.known_rolls.append(roll_number)
-                            self.known_metadata.append({
-                                'registration_date': student_info.get('registration_date', 'unknown'),
-                                'role': student_info.get('role', 'student'),
-                                'encoding_index': i
-                            })
-                            total_encodings += 1
+                        encoding_blocks.append(np.asarray(encodings_list, dtype=np.float32).reshape(-1, 128))
+                        names.extend([student_info['name']] * count)
+                        rolls.extend([roll_number] * count)
+                        metadata.extend({
+                            'registration_date': student_info.get('registration_date', 'unknown'),
+                            'role': student_info.get('role', 'student'),
+                            'encoding_index': i
+                        } for i in range(count))
+                        total_encodings += count
+                
+                self.build_known_matrix(encoding_blocks, names, rolls, metadata)
                 
                 self.logger.info(f"✅ Loaded {total_encodings} face encodings for {len(students_data)} students")
                 
@@ -150,52 +243,63 @@ class AdvancedFaceRecognition:
                 
         except Exception as e:
             self.logger.error(f"❌ Error loading encodings: {e}")
-            self.known_encodings = []
-            self.known_names = []
-            self.known_rolls = []
-            self.known_metadata = []
+            encoding_blocks = []
+        
+        if not encoding_blocks:
+            self.build_known_matrix([])
+    
+    def build_known_matrix(self, encoding_blocks, names=(), rolls=(), metadata=()):
+        """Stack per-student encoding blocks into one contiguous (N, 128) float32 matrix and publish it with its labels"""
+        if encoding_blocks:
+            known_matrix = np.ascontiguousarray(np.vstack(encoding_blocks), dtype=np.float32)
+        else:
+            known_matrix = np.empty((0, 128), dtype=np.float32)
+        
+        # Squared norms of every known encoding, reused by each distance query
+        known_sq = np.einsum('ij,ij->i', known_matrix, known_matrix)
+        
+        # L2-normalized copy so matching is a single dot product (||a-b||² = 2 - 2cosθ)
+        norms = np.sqrt(known_sq)[:, None]
+        known_unit = np.ascontiguousarray(known_matrix / np.maximum(norms, 1e-12), dtype=np.float32)
+        
+        # Int8 codes of the unit vectors (4x less memory traffic for the coarse pass)
+        known_q, known_q_inv_scale = quantize_int8(known_unit)
+        
+        # FAISS index over the unit vectors for large libraries (None for small ones)
+        index = build_l2_index(known_unit)
+        
+        self._publish_known(known_matrix, known_sq, known_unit, known_q, known_q_inv_scale, index, names, rolls, metadata)
+    
+    def _publish_known(self, known_matrix, known_sq, known_unit, known_q, known_q_inv_scale, index, names, rolls, metadata):
+        """Swap in a new gallery in one step; recognize_faces reads every field from the self._known tuple"""
+        names, rolls, metadata = tuple(names), tuple(rolls), tuple(metadata)
+        with self._known_lock:
+            self.known_matrix, self.known_sq = known_matrix, known_sq
+            self.known_unit, self.known_q, self.known_q_inv_scale, self.index = known_unit, known_q, known_q_inv_scale, index
+            self.known_names, self.known_rolls, self.known_metadata = names, rolls, metadata
+            self._known = (known_unit, known_q, known_q_inv_scale, index, names, rolls, metadata)
+            # Cached row indices refer to the old gallery
+            self._recog_cache.clear()
     
     def auto_calibrate(self):
         """Automatically calibrate recognition parameters based on existing data"""
         self.logger.info("🔧 Starting automatic calibration...")
         
-        if len(self.known_encodings) < 5:
+        if len(self.known_matrix) < 5:
             self.logger.warning("⚠️ Insufficient data for auto-calibration")
             return
         
         try:
-            # Calculate inter-class distances (different people)
-            inter_class_distances = []
-            intra_class_distances = []
-            
-            # Group encodings by person
-            person_encodings = defaultdict(list)
-            for i, roll in enumerate(self.known_rolls):
-                person_encodings[roll].append(self.known_encodings[i])
-            
-            # Calculate intra-class distances (same person)
-            for roll, encodings in person_encodings.items():
-                if len(encodings) > 1:
-                    for i in range(len(encodings)):
-                        for j in range(i + 1, len(encodings)):
-                            distance = face_recognition.face_distance([encodings[i]], encodings[j])[0]
-                            intra_class_distances.append(distance)
-            
-            # Calculate inter-class distances (different people)
-            rolls = list(person_encodings.keys())
-            for i in range(len(rolls)):
-                for j in range(i + 1, len(rolls)):
-                    for enc1 in person_encodings[rolls[i]][:2]:  # Limit to prevent too many comparisons
-                        for enc2 in person_encodings[rolls[j]][:2]:
-                            distance = face_recognition.face_distance([enc1], enc2)[0]
-                            inter_class_distances.append(distance)
-            
-            if intra_class_distances and inter_class_distances:
-                # Calculate optimal threshold
-                avg_intra = statistics.mean(intra_class_distances)
-                avg_inter = statistics.mean(inter_class_distances)
-                std_intra = statistics.stdev(intra_class_distances) if len(intra_class_distances) > 1 else 0.1
-                
+            # Snapshot once - appends publish a new gallery, possibly while we run in the background
+            with self._known_lock:
+                known_unit, _, _, _, _, known_rolls, _ = self._known
+            
+            # Stream pairwise distances on the unit sphere (same space as matching)
+            # without materializing the N x N matrix
+            _, labels = np.unique(np.array(known_rolls), return_inverse=True)
+            avg_intra, std_intra, intra_count, avg_inter, inter_count = calibration_stats(known_unit, labels)
+            
+            if intra_count and inter_count:
                 # Set threshold between the distributions
                 optimal_threshold = avg_intra + 2 * std_intra
                 
@@ -227,7 +331,7 @@ class AdvancedFaceRecognition:
                 'quality_threshold': self.quality_threshold,
                 'face_detection_model': self.current_model,
                 'calibration_stats': {
-                    'encodings_used': len(self.known_encodings),
+                    'encodings_used': len(self.known_matrix),
                     'unique_persons': len(set(self.known_rolls))
                 }
             }
@@ -241,8 +345,9 @@ class AdvancedFaceRecognition:
         except Exception as e:
             self.logger.error(f"❌ Failed to save calibration results: {e}")
     
-    def assess_image_quality(self, image: np.ndarray, face_location: Tuple) -> Dict:
-        """Assess the quality of a face image"""
+    def assess_image_quality(self, image: np.ndarray, face_location: Tuple,
+                             lap_frame: Optional[np.ndarray] = None, integral: Optional[np.ndarray] = None) -> Dict:
+        """Assess the quality of a face image (pass per-frame Laplacian/integral image to score faces by ROI lookups)"""
         top, right, bottom, left = face_location
         face_img = image[top:bottom, left:right]
         
@@ -263,14 +368,20 @@ class AdvancedFaceRecognition:
             issues.append('Face too large')
         
         # Blur detection using Laplacian variance
-        gray_face = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if len(face_img.shape) == 3 else face_img
-        blur_score = cv2.Laplacian(gray_face, cv2.CV_64F).var()
+        if lap_frame is not None and integral is not None:
+            blur_score = float(lap_frame[top:bottom, left:right].var())
+            # O(1) mean over the face box from the integral image
+            brightness = float(integral[bottom, right] - integral[top, right]
+                               - integral[bottom, left] + integral[top, left]) / (face_height * face_width)
+        else:
+            gray_face = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if len(face_img.shape) == 3 else face_img
+            blur_score = float(cv2.Laplacian(gray_face, cv2.CV_32F).var())
+            brightness = float(gray_face.mean())
         quality_metrics['blur_score'] = min(1.0, blur_score / self.blur_threshold)
         if blur_score < self.blur_threshold * 0.5:
             issues.append('Image too blurry')
         
         # Brightness check
-        brightness = np.mean(gray_face)
         if brightness < self.brightness_range[0]:
             quality_metrics['brightness_score'] = 0.4
             issues.append('Image too dark')
@@ -303,13 +414,29 @@ class AdvancedFaceRecognition:
         self.recognition_stats['total_attempts'] += 1
         
         try:
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces with current model
-            face_locations = face_recognition.face_locations(rgb_frame, model=self.current_model)
+            # Convert BGR to RGB into a reused buffer
+            if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+                self._rgb_buf = np.empty_like(frame)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+            
+            # Detect faces on a downscaled copy (detection cost is proportional to pixel count)
+            if self.detect_scale < 1.0:
+                height, width = rgb_frame.shape[:2]
+                small_size = (max(1, int(width * self.detect_scale)), max(1, int(height * self.detect_scale)))
+                if self._small_buf is None or self._small_buf.shape[:2] != (small_size[1], small_size[0]):
+                    self._small_buf = np.empty((small_size[1], small_size[0], 3), dtype=np.uint8)
+                small_frame = cv2.resize(rgb_frame, small_size, dst=self._small_buf, interpolation=cv2.INTER_AREA)
+                face_locations = [
+                    (max(0, int(top / self.detect_scale)), min(width, int(right / self.detect_scale)),
+                     min(height, int(bottom / self.detect_scale)), max(0, int(left / self.detect_scale)))
+                    for top, right, bottom, left in face_recognition.face_locations(small_frame, model=self.current_model)
+                ]
+            else:
+                face_locations = face_recognition.face_locations(rgb_frame, model=self.current_model)
             
-            self.logger.debug(f"🔍 Detected {len(face_locations)} faces using {self.current_model} model")
+            debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+            if debug_enabled:
+                self.logger.debug(f"🔍 Detected {len(face_locations)} faces using {self.current_model} model")
             
             if not face_locations:
                 return []
@@ -317,9 +444,77 @@ class AdvancedFaceRecognition:
             # Get face encodings
             face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
             
+            # One consistent snapshot of the gallery - _append_encodings may publish a new one meanwhile.
+            # The cache is read under the same lock so its row indices belong to this snapshot
+            misses = []
+            with self._known_lock:
+                known = self._known
+                known_unit, known_q, known_q_inv_scale, index, known_names, known_rolls, known_metadata = known
+                
+                # Match every uncached face in the frame with one (K, N) cosine-similarity GEMM
+                if len(known_unit) > 0 and face_encodings:
+                    best_indices = np.empty(len(face_encodings), dtype=np.int64)
+                    best_distances = np.empty(len(face_encodings), dtype=np.float32)
+                    keys = [(encoding * 32).astype(np.int8).tobytes() for encoding in face_encodings]
+                    for i, key in enumerate(keys):
+                        cached = self._recog_cache.get(key)
+                        if cached is None:
+                            misses.append(i)
+                        else:
+                            self._recog_cache.move_to_end(key)
+                            best_indices[i], best_distances[i] = cached
+                    self.recognition_stats['cache_hits'] += len(keys) - len(misses)
+                    self.recognition_stats['cache_misses'] += len(misses)
+            
+            if misses:
+                P = np.ascontiguousarray(np.stack([face_encodings[i] for i in misses]), dtype=np.float32)
+                P /= np.maximum(np.linalg.norm(P, axis=1, keepdims=True), 1e-12)
+                rows = np.arange(len(P))
+                if index is not None:
+                    # FAISS returns squared L2 on unit vectors, i.e. 2 - 2cosθ
+                    D, I = index.search(P, 1)
+                    miss_indices = I[:, 0]
+                    best_sims = 1.0 - D[:, 0] / 2.0
+                elif self.quantized_matching:
+                    # Coarse int8 shortlist, then exact float32 re-rank to keep thresholds accurate
+                    candidates = int8_shortlist(known_q, known_q_inv_scale, P, self.rerank_candidates)
+                    candidate_sims = np.einsum('kd,kcd->kc', P, known_unit[candidates])
+                    best_positions = np.argmax(candidate_sims, axis=1)
+                    miss_indices = candidates[rows, best_positions]
+                    best_sims = candidate_sims[rows, best_positions]
+                elif len(P) == 1:
+                    # Single face (the usual attendance case): specialized d=128 kernel, no GEMM setup
+                    d2_buf = getattr(self._match_local, 'd2', None)
+                    if d2_buf is None or len(d2_buf) != len(known_unit):
+                        d2_buf = self._match_local.d2 = np.empty(len(known_unit), dtype=np.float32)
+                    d2 = l2_128(known_unit, P[0], d2_buf)
+                    miss_indices = np.array([np.argmin(d2)])
+                    best_sims = 1.0 - d2[miss_indices] / 2.0
+                else:
+                    sims = P @ known_unit.T
+                    miss_indices = np.argmax(sims, axis=1)
+                    best_sims = sims[rows, miss_indices]
+                miss_distances = np.sqrt(np.maximum(2.0 - 2.0 * best_sims, 0))
+                for j, i in enumerate(misses):
+                    best_indices[i] = miss_indices[j]
+                    best_distances[i] = miss_distances[j]
+                # Only cache against the gallery still published - a newer one already cleared the cache
+                with self._known_lock:
+                    if self._known is known:
+                        for j, i in enumerate(misses):
+                            self._recog_cache[keys[i]] = (int(miss_indices[j]), float(miss_distances[j]))
+                        while len(self._recog_cache) > self.recog_cache_size:
+                            self._recog_cache.popitem(last=False)
+            
+            # One Laplacian and one integral image per frame, shared by every face's quality check
+            if return_quality:
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                lap_frame = cv2.Laplacian(gray_frame, cv2.CV_32F)
+                integral = cv2.integral(gray_frame)
+            
             results = []
             
-            for i, (face_encoding, face_location) in enumerate(zip(face_encodings, face_locations)):
+            for i, face_location in enumerate(face_locations[:len(face_encodings)]):
                 result = {
                     'face_id': i,
                     'location': face_location,
@@ -333,50 +528,56 @@ class AdvancedFaceRecognition:
                 
                 # Quality assessment
                 if return_quality:
-                    quality_info = self.assess_image_quality(rgb_frame, face_location)
+                    quality_info = self.assess_image_quality(rgb_frame, face_location, lap_frame, integral)
                     result['quality'] = quality_info
                     
                     if quality_info['overall_score'] < self.quality_threshold:
                         self.logger.warning(f"⚠️ Low quality face detected: {quality_info['issues']}")
                 
                 # Face recognition
-                if len(self.known_encodings) > 0:
-                    # Calculate distances to all known faces
-                    face_distances = face_recognition.face_distance(self.known_encodings, face_encoding)
-                    
-                    # Find best match
-                    best_match_index = np.argmin(face_distances)
-                    best_distance = face_distances[best_match_index]
+                if len(known_unit) > 0:
+                    # Best match from the batched distance matrix
+                    best_match_index = int(best_indices[i])
+                    best_distance = float(best_distances[i])
                     confidence = 1.0 - best_distance
                     
                     # Log recognition attempt
-                    self.logger.debug(f"🎯 Face {i}: Best distance={best_distance:.3f}, Confidence={confidence:.3f}")
+                    if debug_enabled:
+                        self.logger.debug(f"🎯 Face {i}: Best distance={best_distance:.3f}, Confidence={confidence:.3f}")
                     
                     # Check if it's a valid match
                     if best_distance <= self.face_distance_threshold and confidence >= self.confidence_threshold:
                         result.update({
                             'recognized': True,
-                            'name': self.known_names[best_match_index],
-                            'roll_number': self.known_rolls[best_match_index],
+                            'name': known_names[best_match_index],
+                            'roll_number': known_rolls[best_match_index],
                             'confidence': confidence,
                             'distance': best_distance,
-                            'metadata': self.known_metadata[best_match_index]
+                            'metadata': known_metadata[best_match_index]
                         })
                         
                         self.recognition_stats['successful_recognitions'] += 1
                         self.recognition_stats['confidence_scores'].append(confidence)
+                        self._confidence_sum += confidence
+                        self._confidence_count += 1
+                        self._confidence_min = min(self._confidence_min, confidence)
                         
                         self.logger.info(f"✅ Recognized: {result['name']} ({result['roll_number']}) - Confidence: {confidence:.3f}")
                     else:
-                        self.logger.info(f"❌ Unknown face - Best match: {self.known_names[best_match_index]} (distance: {best_distance:.3f})")
+                        self.logger.info(f"❌ Unknown face - Best match: {known_names[best_match_index]} (distance: {best_distance:.3f})")
                 
                 results.append(result)
             
             # Record processing time
             processing_time = (datetime.now() - start_time).total_seconds()
             self.recognition_stats['processing_times'].append(processing_time)
+            self._recent_times.append(processing_time)
+            self._time_sum += processing_time
+            self._time_count += 1
+            self._time_max = max(self._time_max, processing_time)
             
-            self.logger.debug(f"⏱️ Processing time: {processing_time:.3f}s")
+            if debug_enabled:
+                self.logger.debug(f"⏱️ Processing time: {processing_time:.3f}s")
             
             return results
             
@@ -384,15 +585,62 @@ class AdvancedFaceRecognition:
             self.logger.error(f"❌ Recognition error: {e}")
             return []
     
+    def recognize_faces_async(self, frame: np.ndarray, return_quality=True) -> Future:
+        """Queue a frame for recognition on the worker thread and return a Future for its results.
+        
+        Only the newest frame waits in the queue; a frame replaced before the worker picks it up
+        has its Future cancelled. Do not modify the frame until its Future is done."""
+        if self._async_executor is None:
+            self._async_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='face-recognition')
+        
+        future = Future()
+        while True:
+            try:
+                self._async_slot.put_nowait((frame, return_quality, future))
+                break
+            except queue.Full:
+                try:
+                    _, _, stale_future = self._async_slot.get_nowait()
+                    stale_future.cancel()
+                except queue.Empty:
+                    pass
+        
+        self._async_executor.submit(self._run_queued_frame)
+        return future
+    
+    def _run_queued_frame(self):
+        """Worker side of recognize_faces_async: process whatever frame is currently queued"""
+        try:
+            frame, return_quality, future = self._async_slot.get_nowait()
+        except queue.Empty:
+            return  # Already handled by an earlier submission
+        
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self.recognize_faces(frame, return_quality))
+        except Exception as e:
+            future.set_exception(e)
+    
+    def shutdown_async(self):
+        """Stop the async recognition worker"""
+        if self._async_executor is not None:
+            self._async_executor.shutdown(wait=True)
+            self._async_executor = None
+    
     def adaptive_model_selection(self, frame_count: int):
         """Adaptively select face detection model based on performance"""
-        if frame_count % 100 == 0 and len(self.recognition_stats['processing_times']) > 10:
-            avg_time = statistics.mean(self.recognition_stats['processing_times'][-10:])
+        if frame_count % 100 == 0 and self._time_count > 10:
+            avg_time = statistics.mean(self._recent_times)
             
             # Switch to faster model if processing is slow
             if avg_time > 0.5 and self.current_model == "cnn":
                 self.current_model = "hog"
                 self.logger.info("🔄 Switched to HOG model for better performance")
+            # Already on HOG and still slow - detect on a smaller frame
+            elif avg_time > 0.5 and self.detect_scale > self.min_detect_scale:
+                self.detect_scale = max(self.min_detect_scale, self.detect_scale / 2)
+                self.logger.info(f"🔄 Reduced detection scale to {self.detect_scale:.2f} for better performance")
             # Switch to more accurate model if processing is fast
             elif avg_time < 0.2 and self.current_model == "hog":
                 self.current_model = "cnn"
@@ -407,13 +655,13 @@ class AdvancedFaceRecognition:
         else:
             stats['recognition_rate'] = 0.0
         
-        if stats['processing_times']:
-            stats['avg_processing_time'] = statistics.mean(stats['processing_times'])
-            stats['max_processing_time'] = max(stats['processing_times'])
+        if self._time_count:
+            stats['avg_processing_time'] = self._time_sum / self._time_count
+            stats['max_processing_time'] = self._time_max
         
-        if stats['confidence_scores']:
-            stats['avg_confidence'] = statistics.mean(stats['confidence_scores'])
-            stats['min_confidence'] = min(stats['confidence_scores'])
+        if self._confidence_count:
+            stats['avg_confidence'] = self._confidence_sum / self._confidence_count
+            stats['min_confidence'] = self._confidence_min
         
         return stats
     
@@ -469,60 +717,57 @@ class AdvancedFaceRecognition:
             
             print(f"📸 Found {len(image_files)} images to process")
             
-            encodings = []
             processed_count = 0
             failed_count = 0
+            results = {}
             
-            for i, image_path in enumerate(image_files):
-                try:
+            # Encode images in parallel - each dlib HOG/encoding pass is CPU-bound and independent
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                futures = {executor.submit(_encode_one, image_path): i for i, image_path in enumerate(image_files)}
+                
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    image_path = image_files[i]
+                    image_name = os.path.basename(image_path)
+                    
                     if callback:
-                        callback(f"Processing image {i+1}/{len(image_files)}: {os.path.basename(image_path)}")
+                        callback(f"Processed image {done}/{len(image_files)}: {image_name}")
                     
-                    print(f"🔍 Processing image {i+1}/{len(image_files)}: {os.path.basename(image_path)}")
+                    try:
+                        encoding, status, face_count = future.result()
+                    except Exception as e:
+                        self.logger.error(f"❌ Error processing {image_path}: {str(e)}")
+                        print(f"❌ Error in {image_name}: {str(e)}")
+                        failed_count += 1
+                        continue
                     
-                    # Load image
-                    image = cv2.imread(image_path)
-                    if image is None:
+                    if status == 'unreadable':
                         self.logger.warning(f"⚠️ Could not load image: {image_path}")
-                        print(f"⚠️ Skipping corrupted image: {os.path.basename(image_path)}")
+                        print(f"⚠️ Skipping corrupted image: {image_name}")
                         failed_count += 1
                         continue
                     
-                    # Convert BGR to RGB
-                    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                    
-                    # Detect faces
-                    face_locations = face_recognition.face_locations(rgb_image, model="hog")
-                    
-                    if not face_locations:
+                    if status == 'no_face':
                         self.logger.warning(f"⚠️ No face detected in {image_path}")
-                        print(f"⚠️ No face found in: {os.path.basename(image_path)}")
+                        print(f"⚠️ No face found in: {image_name}")
                         failed_count += 1
                         continue
                     
-                    if len(face_locations) > 1:
+                    if face_count > 1:
                         self.logger.warning(f"⚠️ Multiple faces detected in {image_path}, using largest")
-                        print(f"⚠️ Multiple faces in {os.path.basename(image_path)}, using largest")
-                        # Use the largest face
-                        face_locations = [max(face_locations, key=lambda loc: (loc[2]-loc[0])*(loc[1]-loc[3]))]
-                    
-                    # Generate encoding
-                    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+                        print(f"⚠️ Multiple faces in {image_name}, using largest")
                     
-                    if face_encodings:
-                        encodings.append(face_encodings[0].tolist())
+                    if encoding is not None:
+                        results[i] = encoding
                         processed_count += 1
-                        print(f"✅ Successfully processed: {os.path.basename(image_path)}")
+                        print(f"✅ Successfully processed: {image_name}")
                     else:
                         self.logger.warning(f"⚠️ Could not generate encoding for {image_path}")
-                        print(f"⚠️ Failed to encode: {os.path.basename(image_path)}")
+                        print(f"⚠️ Failed to encode: {image_name}")
                         failed_count += 1
-                
-                except Exception as e:
-                    self.logger.error(f"❌ Error processing {image_path}: {str(e)}")
-                    print(f"❌ Error in {os.path.basename(image_path)}: {str(e)}")
-                    failed_count += 1
-                    continue
+            
+            # Keep encodings in image order regardless of completion order
+            encodings = [results[i] for i in sorted(results)]
             
             print(f"\n📊 PROCESSING SUMMARY:")
             print(f"✅ Successfully processed: {processed_count} images")
@@ -535,10 +780,10 @@ class AdvancedFaceRecognition:
                 print(f"❌ {error_msg}")
                 return False
             
-            # Save encodings
-            success = self.save_student_encodings(student_roll, encodings)
+            # Save encodings (deduplicated there); the returned rows are exactly what was stored
+            encodings = self.save_student_encodings(student_roll, encodings)
             
-            if success:
+            if encodings is not None:
                 print(f"💾 Encodings saved successfully!")
                 print(f"🎯 Generated {len(encodings)} face encodings for {student_roll}")
                 self.logger.info(f"✅ Successfully generated {len(encodings)} encodings for {student_roll}")
@@ -546,8 +791,8 @@ class AdvancedFaceRecognition:
                 # Update model metadata
                 self.update_model_metadata()
                 
-                # Reload encodings to include new data
-                self.load_encodings()
+                # Add the new rows in memory instead of reloading every encoding
+                self._append_encodings(student_roll, np.asarray(encodings, dtype=np.float32).reshape(-1, 128))
                 
                 return True
             else:
@@ -560,8 +805,73 @@ class AdvancedFaceRecognition:
             print(f"🔍 Traceback: {traceback.format_exc()}")
             return False
     
-    def save_student_encodings(self, student_roll: str, encodings: List) -> bool:
-        """Save encodings for a specific student"""
+    def _append_encodings(self, roll: str, new_arr: np.ndarray):
+        """Add one student's encodings to the in-memory matrices without re-reading encodings.json"""
+        students_file = os.path.join(self.json_folder, 'students.json')
+        with open(students_file, 'r') as f:
+            student_info = json.load(f).get(roll)
+        if student_info is None:
+            self.logger.warning(f"⚠️ {roll} is not in students.json, encodings not loaded")
+            return
+        
+        count = len(new_arr)
+        names = [student_info['name']] * count
+        rolls = [roll] * count
+        metadata = [{
+            'registration_date': student_info.get('registration_date', 'unknown'),
+            'role': student_info.get('role', 'student'),
+            'encoding_index': i
+        } for i in range(count)]
+        
+        # Build every new list and array first; _publish_known swaps them in (and clears the cache) under one lock
+        if roll in self.known_rolls:
+            # Re-registration replaces the old rows - rebuild from the kept rows plus the new ones
+            keep = np.array(self.known_rolls) != roll
+            self.build_known_matrix([self.known_matrix[keep], new_arr],
+                                    [n for n, k in zip(self.known_names, keep) if k] + names,
+                                    [r for r, k in zip(self.known_rolls, keep) if k] + rolls,
+                                    [m for m, k in zip(self.known_metadata, keep) if k] + metadata)
+        else:
+            new_sq = np.einsum('ij,ij->i', new_arr, new_arr)
+            new_unit = new_arr / np.maximum(np.sqrt(new_sq), 1e-12)[:, None]
+            new_q, new_q_inv_scale = quantize_int8(new_unit)
+            
+            known_unit = np.ascontiguousarray(np.vstack([self.known_unit, new_unit]), dtype=np.float32)
+            # A fresh index, never index.add - searches may still be running on the published one
+            self._publish_known(np.ascontiguousarray(np.vstack([self.known_matrix, new_arr]), dtype=np.float32),
+                                np.concatenate([self.known_sq, new_sq]),
+                                known_unit,
+                                np.vstack([self.known_q, new_q]),
+                                np.concatenate([self.known_q_inv_scale, new_q_inv_scale]),
+                                build_l2_index(known_unit),
+                                self.known_names + tuple(names),
+                                self.known_rolls + tuple(rolls),
+                                self.known_metadata + tuple(metadata))
+        
+        self.logger.info(f"➕ Added {count} encodings for {roll} ({len(self.known_matrix)} total)")
+        
+        # Calibration is O(N²) - run it off-thread every few students instead of on every append
+        self._appends_since_calibration += 1
+        if self._appends_since_calibration >= self.calibrate_every and len(self.known_matrix) >= 10:
+            self._appends_since_calibration = 0
+            threading.Thread(target=self.auto_calibrate, daemon=True).start()
+    
+    def deduplicate_encodings(self, encodings: List) -> List:
+        """Greedy L2 dedup: keep an encoding only if it is farther than dedup_threshold from every kept one"""
+        if len(encodings) < 2 or self.dedup_threshold <= 0:
+            return encodings
+        
+        E = np.asarray(encodings, dtype=np.float32)
+        kept = [0]
+        for i in range(1, len(E)):
+            distances = np.linalg.norm(E[kept] - E[i], axis=1)
+            if distances.min() > self.dedup_threshold:
+                kept.append(i)
+        
+        return [encodings[i] for i in kept]
+    
+    def save_student_encodings(self, student_roll: str, encodings: List) -> Optional[List]:
+        """Save encodings for a specific student; returns the stored (deduplicated) rows, or None on failure"""
         try:
             encodings_file = os.path.join(self.json_folder, 'encodings.json')
             
@@ -572,22 +882,30 @@ class AdvancedFaceRecognition:
             else:
                 all_encodings = {}
             
+            # Drop near-duplicate encodings (adjacent video frames) before storing
+            original_count = len(encodings)
+            encodings = self.deduplicate_encodings(encodings)
+            if len(encodings) < original_count:
+                self.logger.info(f"🧹 Removed {original_count - len(encodings)} near-duplicate encodings for {student_roll}")
+            
             # Add/update student encodings
             all_encodings[student_roll] = encodings
             
-            # Save back to file
-            with open(encodings_file, 'w') as f:
-                json.dump(all_encodings, f, indent=2)
+            # Save back to file atomically (a crash mid-write must not corrupt every student's encodings)
+            atomic_write_json(encodings_file, all_encodings)
+            
+            # Refresh the binary cache so the next load can memory-map it
+            save_encoding_cache(self.json_folder, all_encodings)
             
             self.logger.info(f"💾 Saved {len(encodings)} encodings for student {student_roll}")
             print(f"💾 Encodings saved to: {encodings_file}")
-            return True
+            return encodings
             
         except Exception as e:
             error_msg = f"Failed to save encodings: {str(e)}"
             self.logger.error(error_msg)
             print(f"❌ {error_msg}")
-            return False
+            return None
     
     def update_model_metadata(self):
         """Update model metadata file"""
@@ -599,7 +917,12 @@ class AdvancedFaceRecognition:
             total_students = 0
             total_encodings = 0
             
-            if os.path.exists(encodings_file):
+            # The binary cache index already has per-student counts - only parse JSON without it
+            counts = cached_encoding_counts(self.json_folder)
+            if counts is not None:
+                total_students = len(counts)
+                total_encodings = sum(counts.values())
+            elif os.path.exists(encodings_file):
                 with open(encodings_file, 'r') as f:
                     encodings_data = json.load(f)
                     total_students = len(encodings_data)
@@ -612,11 +935,11 @@ class AdvancedFaceRecognition:
                 "model_version": "2.0",
                 "face_detection_model": self.current_model,
                 "distance_threshold": self.face_distance_threshold,
-                "confidence_threshold": self.confidence_threshold
+                "confidence_threshold": self.confidence_threshold,
+                "encoding_dedup_threshold": self.dedup_threshold
             }
             
-            with open('model_metadata.json', 'w') as f:
-                json.dump(metadata, f, indent=2)
+            atomic_write_json('model_metadata.json', metadata, indent=2)
             
             self.logger.info(f"📊 Updated model metadata: {total_students} students, {total_encodings} encodings")
             print(f"📊 Model metadata updated")
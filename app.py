@@ -7,7 +7,8 @@ Main Application Launcher
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
-import json
+import importlib.util
+from file_utils import dump_json
 from datetime import datetime
 import subprocess
 import sys
@@ -38,7 +39,11 @@ class FaceAttendanceApp:
     def check_face_recognition_status(self):
         """Check if face_recognition is available"""
         try:
-            import face_recognition
+            # Locate the packages without importing them - importing loads dlib and its models,
+            # which would cost seconds before the launcher window appears
+            for module_name in ('face_recognition', 'face_recognition_models', 'dlib'):
+                if importlib.util.find_spec(module_name) is None:
+                    raise ImportError(f"No module named '{module_name}'")
             self.face_recognition_available = True
             print("✅ Face recognition library is available")
         except Exception as e:
@@ -51,13 +56,11 @@ class FaceAttendanceApp:
         try:
             # Create json_data/students.json if it doesn't exist
             if not os.path.exists('json_data/students.json'):
-                with open('json_data/students.json', 'w') as f:
-                    json.dump({}, f, indent=2)
+                dump_json('json_data/students.json', {}, indent=2)
             
             # Create json_data/encodings.json if it doesn't exist
             if not os.path.exists('json_data/encodings.json'):
-                with open('json_data/encodings.json', 'w') as f:
-                    json.dump({}, f, indent=2)
+                dump_json('json_data/encodings.json', {}, indent=2)
                     
             self.update_status("Data files initialized successfully")
             
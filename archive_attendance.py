@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Attendance Archiver
+Compresses past days' attendance files to .json.zst; today's file is left for the recognizer
+"""
+
+import os
+from datetime import date
+from file_utils import compress_json_file, ZSTD_AVAILABLE
+
+def archive_attendance(attendance_folder="attendance"):
+    """Compress every day file older than today; returns the number of files compressed"""
+    today_file = f"{date.today().isoformat()}.json"
+    archived = 0
+    with os.scandir(attendance_folder) as entries:
+        paths = [entry.path for entry in entries
+                 if entry.name.endswith('.json') and entry.name != today_file and not entry.name.startswith('.')]
+    
+    for path in sorted(paths):
+        try:
+            compress_json_file(path)
+            archived += 1
+        except Exception as e:
+            print(f"⚠️  Could not compress {path}: {e}")
+    return archived
+
+def main():
+    if not ZSTD_AVAILABLE:
+        print("❌ zstandard is not installed - run: pip install zstandard")
+        return
+    if not os.path.isdir("attendance"):
+        print("❌ No attendance folder found")
+        return
+    
+    archived = archive_attendance()
+    print(f"✅ Compressed {archived} attendance file(s)")
+
+if __name__ == "__main__":
+    main()
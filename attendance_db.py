@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Attendance Database
+SQLite index of the per-day attendance JSON files so date-range questions are one query
+"""
+
+import os
+import sqlite3
+
+DB_FILE = 'attendance.sqlite'
+
+
+def connect(attendance_folder):
+    """Open (and create if needed) the index next to the day files; one connection per thread"""
+    conn = sqlite3.connect(os.path.join(attendance_folder, DB_FILE))
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS attendance(date TEXT, roll TEXT, time TEXT, PRIMARY KEY(date, roll));
+        CREATE INDEX IF NOT EXISTS ix_date ON attendance(date);
+        CREATE TABLE IF NOT EXISTS imported(date TEXT PRIMARY KEY, mtime_ns INTEGER);
+    ''')
+    return conn
+
+
+def stale_days(conn, file_mtimes):
+    """Dates whose day file is newer than (or missing from) the index; file_mtimes maps date -> mtime_ns"""
+    imported = dict(conn.execute('SELECT date, mtime_ns FROM imported'))
+    return [date_str for date_str, mtime_ns in file_mtimes.items() if imported.get(date_str) != mtime_ns]
+
+
+def import_day(conn, date_str, mtime_ns, records):
+    """Replace one day's rows with the records of its JSON file ({roll: {'time': ...}})"""
+    with conn:
+        conn.execute('DELETE FROM attendance WHERE date = ?', (date_str,))
+        conn.executemany('INSERT INTO attendance(date, roll, time) VALUES (?, ?, ?)',
+                         [(date_str, roll, info.get('time')) for roll, info in records.items()])
+        conn.execute('INSERT OR REPLACE INTO imported(date, mtime_ns) VALUES (?, ?)', (date_str, mtime_ns))
+
+
+def forget_days(conn, first, last, keep):
+    """Drop indexed days in [first, last] whose file no longer exists"""
+    gone = [(date_str,) for (date_str,) in conn.execute('SELECT date FROM imported WHERE date BETWEEN ? AND ?', (first, last))
+            if date_str not in keep]
+    if gone:
+        with conn:
+            conn.executemany('DELETE FROM attendance WHERE date = ?', gone)
+            conn.executemany('DELETE FROM imported WHERE date = ?', gone)
+
+
+def day_counts(conn, first, last):
+    """{date: attendance marks} for every indexed day in [first, last] (ISO date strings), empty days included"""
+    return dict(conn.execute('SELECT i.date, COUNT(a.roll) FROM imported i LEFT JOIN attendance a ON a.date = i.date '
+                             'WHERE i.date BETWEEN ? AND ? GROUP BY i.date', (first, last)))
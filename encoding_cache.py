@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Encoding Cache
+Binary float32 copy of encodings.json that can be memory-mapped instead of re-parsed
+"""
+
+import json
+import os
+import tempfile
+import numpy as np
+from file_utils import atomic_write_json
+
+CACHE_FILE = 'encodings.npy'
+INDEX_FILE = 'encodings_index.json'
+QUANTIZED_FILE = 'encodings_int8.npz'
+
+
+def save_encoding_cache(json_folder, encodings_data, quantized=False):
+    """Write encodings as one (N, 128) float32 matrix plus a roll -> (start, count) index.
+    
+    With quantized=True an int8 copy (codes + per-row scales, same row order) is written as well.
+    """
+    rolls = []
+    offsets = {}
+    rows = []
+    start = 0
+
+    for roll_number, encodings_list in encodings_data.items():
+        count = len(encodings_list)
+        if count == 0:
+            continue
+        rows.append(np.asarray(encodings_list, dtype=np.float32).reshape(-1, 128))
+        rolls.append(roll_number)
+        offsets[roll_number] = [start, count]
+        start += count
+
+    matrix = np.vstack(rows) if rows else np.empty((0, 128), dtype=np.float32)
+
+    # Temp file + os.replace so a crash never leaves a torn matrix behind
+    fd, tmp_path = tempfile.mkstemp(dir=json_folder, prefix='.tmp_', suffix='.npy')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+    os.replace(tmp_path, os.path.join(json_folder, CACHE_FILE))
+    atomic_write_json(os.path.join(json_folder, INDEX_FILE), {'rolls': rolls, 'offsets': offsets})
+    
+    if quantized:
+        save_quantized_cache(json_folder, matrix)
+
+
+def save_quantized_cache(json_folder, matrix):
+    """Write int8 codes and float32 per-row scales of the matrix (132 bytes per encoding)"""
+    from fast_match import quantize_int8
+    codes, scales = quantize_int8(matrix)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=json_folder, prefix='.tmp_', suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, vecs_i8=codes, scales=scales)
+    os.replace(tmp_path, os.path.join(json_folder, QUANTIZED_FILE))
+
+
+def load_quantized_cache(json_folder):
+    """Int8 (codes, scales) written with the current float32 cache, or None if missing or stale"""
+    quantized_path = os.path.join(json_folder, QUANTIZED_FILE)
+    cache_path = os.path.join(json_folder, CACHE_FILE)
+    
+    if not (os.path.exists(quantized_path) and os.path.exists(cache_path)):
+        return None
+    
+    # Written right after the matrix; an older file belongs to a previous matrix
+    if os.path.getmtime(quantized_path) < os.path.getmtime(cache_path):
+        return None
+    
+    with np.load(quantized_path) as data:
+        return data['vecs_i8'], data['scales']
+
+
+def cached_encoding_counts(json_folder):
+    """Per-roll encoding counts from the cache index, or None if the cache is missing or stale"""
+    cache = load_encoding_cache(json_folder)
+    if cache is None:
+        return None
+    return {roll: count for roll, (_, count) in cache[1].items()}
+
+
+def load_encoding_cache(json_folder):
+    """Memory-map the cached matrix; returns (matrix, offsets) or None if missing or stale"""
+    cache_path = os.path.join(json_folder, CACHE_FILE)
+    index_path = os.path.join(json_folder, INDEX_FILE)
+    encodings_path = os.path.join(json_folder, 'encodings.json')
+
+    if not (os.path.exists(cache_path) and os.path.exists(index_path)):
+        return None
+
+    # encodings.json stays the source of truth - ignore a cache older than it
+    if os.path.exists(encodings_path) and os.path.getmtime(encodings_path) > os.path.getmtime(cache_path):
+        return None
+
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+
+    matrix = np.load(cache_path, mmap_mode='r')
+    offsets = {roll: tuple(index['offsets'][roll]) for roll in index['rolls']}
+    return matrix, offsets
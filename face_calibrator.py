@@ -6,12 +6,15 @@ Helps tune face recognition parameters for better accuracy
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import cv2
-import json
-import numpy as np
-from PIL import Image, ImageTk
-import face_recognition
 import os
+import queue
+import threading
+import time
+from file_utils import load_json, atomic_write_json
+
+# cv2, numpy, PIL, face_recognition (and encoding_cache, which pulls in numpy) are imported where
+# they are first needed, so importing this module loads none of them; the dlib models load in the
+# background warmup
 
 class FaceRecognitionCalibrator:
     def __init__(self, root):
@@ -25,6 +28,29 @@ class FaceRecognitionCalibrator:
         self.current_frame = None
         self.results_text = None  # Initialize results_text first
         
+        # Capture runs on its own thread; only the newest frame is kept for the UI
+        self._frame_slot = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._capture_thread = None
+        self._poll_id = None
+        # A failed read backs off instead of spinning; this many in a row means the camera is gone
+        self.read_retry_delay = 0.05
+        self.max_failed_reads = 40
+        
+        # Detection runs on a quarter-size copy; encodings still use the full frame
+        self.detect_scale = 0.25
+        self._rgb_buf = None
+        
+        # One display buffer and one Tk photo, refilled every frame
+        self.display_size = (480, 360)
+        self._display_buf = None
+        self._photo = None
+        
+        # Int8 coarse matching: shortlist candidates on int8 codes, re-rank in float32.
+        # Only pays off with an int8-capable BLAS backend, so it is opt-in.
+        self.quantized_matching = False
+        self.rerank_candidates = 8
+        
         # Calibration parameters
         self.tolerance = tk.DoubleVar(value=0.4)
         self.confidence_threshold = tk.DoubleVar(value=0.7)
@@ -33,6 +59,9 @@ class FaceRecognitionCalibrator:
         # Load test data
         self.load_test_encodings()
         
+        # Load the dlib models in the background so the first Test click doesn't stall
+        threading.Thread(target=self._warmup, daemon=True).start()
+        
         # Create GUI
         self.create_widgets()
     
@@ -117,34 +146,73 @@ class FaceRecognitionCalibrator:
     
     def load_test_encodings(self):
         """Load existing face encodings for testing"""
+        import numpy as np
+        from encoding_cache import load_encoding_cache
+        
         try:
-            with open('json_data/students.json', 'r') as f:
-                self.students_data = json.load(f)
+            self.students_data = load_json('json_data/students.json')
             
-            with open('json_data/encodings.json', 'r') as f:
-                encodings_data = json.load(f)
+            # Prefer the memory-mapped .npy cache, fall back to parsing JSON
+            cache = load_encoding_cache('json_data')
+            if cache is not None:
+                matrix, offsets = cache
+                encodings_data = {roll: matrix[start:start + count] for roll, (start, count) in offsets.items()}
+            else:
+                encodings_data = load_json('json_data/encodings.json')
             
-            self.known_encodings = []
-            self.known_names = []
-            self.known_rolls = []
+            encoding_blocks = []
+            names = []
+            rolls = []
             
             for roll_number, encodings_list in encodings_data.items():
-                if roll_number in self.students_data:
+                if roll_number in self.students_data and len(encodings_list):
                     student_info = self.students_data[roll_number]
                     student_name = student_info['name']
                     
-                    for encoding in encodings_list:
-                        self.known_encodings.append(np.array(encoding))
-                        self.known_names.append(student_name)
-                        self.known_rolls.append(roll_number)
+                    encoding_blocks.append(np.asarray(encodings_list, dtype=np.float32).reshape(-1, 128))
+                    names.extend([student_name] * len(encodings_list))
+                    rolls.extend([roll_number] * len(encodings_list))
+            
+            # One contiguous (N, 128) matrix so each probe is a single vectorized distance pass
+            if encoding_blocks:
+                self.known_encodings = np.ascontiguousarray(np.vstack(encoding_blocks), dtype=np.float32)
+            else:
+                self.known_encodings = np.empty((0, 128), dtype=np.float32)
+            # Unit-normalized gallery, matched exactly as recognize.py does so the calibrated
+            # tolerance means the same thing there
+            norms = np.linalg.norm(self.known_encodings, axis=1, keepdims=True)
+            self.known_unit = np.ascontiguousarray(self.known_encodings / np.maximum(norms, 1e-12), dtype=np.float32)
+            self.known_names = np.array(names, dtype=object)
+            self.known_rolls = np.array(rolls, dtype=object)
+            
+            # FAISS index and int8 codes are built on the first test so opening the calibrator stays fast
+            self.index = None
+            self._index_built = False
+            self.known_q = None
             
             self.log_result(f"Loaded {len(self.known_encodings)} face encodings for testing")
             
         except Exception as e:
             self.log_result(f"Error loading encodings: {e}")
-            self.known_encodings = []
-            self.known_names = []
-            self.known_rolls = []
+            self.known_encodings = np.empty((0, 128), dtype=np.float32)
+            self.known_unit = np.empty((0, 128), dtype=np.float32)
+            self.known_names = np.array([], dtype=object)
+            self.known_rolls = np.array([], dtype=object)
+            self.index = None
+            self._index_built = False
+            self.known_q = None
+    
+    def _warmup(self):
+        """Import face_recognition and run detection + one encoding on a dummy image"""
+        try:
+            import numpy as np
+            import face_recognition
+            
+            dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+            face_recognition.face_locations(dummy)
+            face_recognition.face_encodings(dummy, known_face_locations=[(0, 63, 63, 0)])
+        except Exception as e:
+            print(f"Calibrator: model warm-up skipped: {e}")
     
     def log_result(self, message):
         """Add message to results log"""
@@ -161,6 +229,8 @@ class FaceRecognitionCalibrator:
     def start_camera(self):
         """Start camera for testing"""
         try:
+            import cv2
+            
             self.camera = cv2.VideoCapture(0)
             if not self.camera.isOpened():
                 messagebox.showerror("Error", "Failed to open camera")
@@ -171,29 +241,83 @@ class FaceRecognitionCalibrator:
             self.stop_btn.config(state='normal')
             self.test_btn.config(state='normal')
             
-            self.update_camera_feed()
+            # A fresh event per session: a previous capture thread may still be winding down
+            self._stop_event = threading.Event()
+            self._capture_thread = threading.Thread(target=self._capture_loop, args=(self.camera, self._stop_event),
+                                                    daemon=True)
+            self._capture_thread.start()
+            self._poll_id = self.root.after(33, self._on_frame)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start camera: {e}")
     
-    def update_camera_feed(self):
-        """Update camera feed"""
-        if self.is_running and self.camera:
-            ret, frame = self.camera.read()
-            if ret:
-                self.current_frame = frame
-                
-                # Convert and display
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_resized = cv2.resize(frame_rgb, (480, 360))
-                
-                pil_image = Image.fromarray(frame_resized)
-                photo = ImageTk.PhotoImage(pil_image)
+    def _capture_loop(self, camera, stop_event):
+        """Read frames off the Tk thread and keep only the latest; releases the camera when stopped"""
+        failed_reads = 0
+        try:
+            while not stop_event.is_set():
+                ret, frame = camera.read()
+                if not ret:
+                    failed_reads += 1
+                    if failed_reads >= self.max_failed_reads:
+                        self.root.after(0, self.on_camera_lost, stop_event)
+                        return
+                    time.sleep(self.read_retry_delay)
+                    continue
+                failed_reads = 0
                 
-                self.camera_label.configure(image=photo)
-                self.camera_label.image = photo
-            
-            self.root.after(30, self.update_camera_feed)
+                # Drop the stale frame if the UI has not consumed it yet
+                try:
+                    self._frame_slot.get_nowait()
+                except queue.Empty:
+                    pass
+                self._frame_slot.put_nowait(frame)
+        finally:
+            # Released here so Stop never waits on an in-flight read
+            camera.release()
+    
+    def on_camera_lost(self, stop_event):
+        """The capture thread gave up on a camera that stopped delivering frames (Tk thread)"""
+        if not self.is_running or self._stop_event is not stop_event:
+            return
+        self.stop_camera()
+        self.log_result("Camera stopped delivering frames - check the connection and start it again")
+    
+    def _on_frame(self):
+        """Tk-side poll (~30 fps): show the newest captured frame"""
+        if not self.is_running:
+            return
+        self._poll_id = self.root.after(33, self._on_frame)
+        
+        try:
+            frame = self._frame_slot.get_nowait()
+        except queue.Empty:
+            return
+        self.update_camera_feed(frame)
+    
+    def update_camera_feed(self, frame):
+        """Update camera feed"""
+        import cv2
+        import numpy as np
+        from PIL import Image, ImageTk
+        
+        self.current_frame = frame
+        
+        # Convert and display
+        width, height = self.display_size
+        if self._display_buf is None:
+            self._display_buf = np.empty((height, width, 3), dtype=np.uint8)
+        frame_resized = cv2.resize(frame, self.display_size, dst=self._display_buf)
+        
+        # Let PIL's raw decoder swap BGR->RGB while reading the small buffer - no full-frame cvtColor
+        pil_image = Image.frombuffer('RGB', self.display_size, frame_resized, 'raw', 'BGR', 0, 1)
+        if self._photo is None:
+            self._photo = ImageTk.PhotoImage(pil_image)
+            self.camera_label.configure(image=self._photo)
+            self.camera_label.image = self._photo
+        else:
+            # Paste into the existing Tk image instead of allocating a new one
+            self._photo.paste(pil_image)
     
     def test_recognition(self):
         """Test face recognition with current settings"""
@@ -201,14 +325,32 @@ class FaceRecognitionCalibrator:
             messagebox.showerror("Error", "No camera frame available")
             return
         
-        if not self.known_encodings:
+        if len(self.known_encodings) == 0:
             messagebox.showerror("Error", "No face encodings loaded for testing")
             return
         
         try:
-            # Find faces
-            rgb_frame = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame, model=self.face_detection_model.get())
+            import cv2
+            import numpy as np
+            import face_recognition
+            from fast_match import best_matches, build_l2_index, quantize_int8, int8_shortlist
+            
+            # Find faces on a downscaled copy (HOG cost scales with pixel count)
+            frame = self.current_frame
+            small_rgb = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=self.detect_scale, fy=self.detect_scale), cv2.COLOR_BGR2RGB)
+            small_locations = face_recognition.face_locations(small_rgb, model=self.face_detection_model.get())
+            
+            # Scale locations back to the full frame for encoding
+            height, width = frame.shape[:2]
+            face_locations = [
+                (max(0, int(top / self.detect_scale)), min(width, int(right / self.detect_scale)),
+                 min(height, int(bottom / self.detect_scale)), max(0, int(left / self.detect_scale)))
+                for top, right, bottom, left in small_locations
+            ]
+            
+            if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+                self._rgb_buf = np.empty_like(frame)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
             
             self.log_result(f"\n--- Test Results (Tolerance: {self.tolerance.get():.2f}, Confidence: {self.confidence_threshold.get():.2f}) ---")
             self.log_result(f"Faces detected: {len(face_locations)}")
@@ -219,27 +361,49 @@ class FaceRecognitionCalibrator:
             
             face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
             
-            for i, face_encoding in enumerate(face_encodings):
-                # Test recognition
-                matches = face_recognition.compare_faces(self.known_encodings, face_encoding, 
-                                                       tolerance=self.tolerance.get())
-                face_distances = face_recognition.face_distance(self.known_encodings, face_encoding)
+            tolerance = self.tolerance.get()
+            # recognize.py turns the saved tolerance into a cosine threshold on unit vectors
+            cosine_threshold = 1.0 - (tolerance ** 2) / 2.0
+            
+            if not self._index_built:
+                self.index = build_l2_index(self.known_unit)  # None below FAISS_MIN_ENCODINGS
+                self._index_built = True
+            
+            probes = np.ascontiguousarray(np.stack(face_encodings), dtype=np.float32)
+            probes /= np.maximum(np.linalg.norm(probes, axis=1, keepdims=True), 1e-12)
+            rows = np.arange(len(probes))
+            if self.index is not None:
+                # Large library: FAISS returns squared L2 on unit vectors, i.e. 2 - 2cosθ
+                D, I = self.index.search(probes, 1)
+                best_indices, best_sims = I[:, 0], 1.0 - D[:, 0] / 2.0
+            elif self.quantized_matching:
+                # Coarse int8 shortlist, then exact float32 re-rank
+                if self.known_q is None:
+                    self.known_q, self.known_q_inv_scale = quantize_int8(self.known_unit)
+                candidates = int8_shortlist(self.known_q, self.known_q_inv_scale, probes, self.rerank_candidates)
+                candidate_sims = np.einsum('kd,kcd->kc', probes, self.known_unit[candidates])
+                best_positions = np.argmax(candidate_sims, axis=1)
+                best_indices, best_sims = candidates[rows, best_positions], candidate_sims[rows, best_positions]
+            else:
+                # Nearest known encoding for every detected face in one JIT-compiled pass
+                best_indices, best_d2, _ = best_matches(self.known_unit, probes, 0.0)
+                best_sims = 1.0 - best_d2 / 2.0
+            matched = best_sims > cosine_threshold
+            best_d2 = np.maximum(2.0 - 2.0 * best_sims, 0.0)
+            
+            for i in range(len(face_encodings)):
+                best_match_index = int(best_indices[i])
+                best_distance = float(np.sqrt(best_d2[i]))
+                confidence = 1.0 - best_distance
                 
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    confidence = 1.0 - face_distances[best_match_index]
-                    
-                    if matches[best_match_index] and confidence >= self.confidence_threshold.get():
-                        name = self.known_names[best_match_index]
-                        roll = self.known_rolls[best_match_index]
-                        self.log_result(f"Face {i+1}: ✅ RECOGNIZED - {name} ({roll}) - Confidence: {confidence:.3f}")
-                    else:
-                        self.log_result(f"Face {i+1}: ❌ NOT RECOGNIZED - Best confidence: {confidence:.3f}")
-                        if len(face_distances) > 0:
-                            best_name = self.known_names[best_match_index]
-                            self.log_result(f"          Closest match: {best_name} (distance: {face_distances[best_match_index]:.3f})")
+                if matched[i] and confidence >= self.confidence_threshold.get():
+                    name = self.known_names[best_match_index]
+                    roll = self.known_rolls[best_match_index]
+                    self.log_result(f"Face {i+1}: ✅ RECOGNIZED - {name} ({roll}) - Confidence: {confidence:.3f}")
                 else:
-                    self.log_result(f"Face {i+1}: ❌ NO ENCODINGS TO COMPARE")
+                    self.log_result(f"Face {i+1}: ❌ NOT RECOGNIZED - Best confidence: {confidence:.3f}")
+                    best_name = self.known_names[best_match_index]
+                    self.log_result(f"          Closest match: {best_name} (distance: {best_distance:.3f})")
             
         except Exception as e:
             self.log_result(f"Error during recognition test: {e}")
@@ -263,8 +427,18 @@ class FaceRecognitionCalibrator:
                 "face_detection_model": self.face_detection_model.get()
             }
             
-            with open('json_data/recognition_config.json', 'w') as f:
-                json.dump(settings, f, indent=2)
+            config_file = 'json_data/recognition_config.json'
+            try:
+                current_settings = load_json(config_file)
+            except (OSError, ValueError):
+                current_settings = None
+            
+            if current_settings == settings:
+                self.log_result("Settings unchanged - nothing to save")
+                return
+            
+            # Temp file + rename so a crash mid-write never leaves a truncated config
+            atomic_write_json(config_file, settings, indent=2)
             
             self.log_result("✅ Settings saved to json_data/recognition_config.json")
             self.log_result("Restart the recognition module to apply changes")
@@ -278,15 +452,25 @@ class FaceRecognitionCalibrator:
     def stop_camera(self):
         """Stop camera"""
         self.is_running = False
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        
+        # The capture thread releases the camera once its current read returns - no join on the Tk thread
+        self._stop_event.set()
+        self._capture_thread = None
+        self.camera = None
+        try:
+            self._frame_slot.get_nowait()
+        except queue.Empty:
+            pass
         
         self.start_btn.config(state='normal')
         self.stop_btn.config(state='disabled')
         self.test_btn.config(state='disabled')
         
         self.camera_label.configure(image='', text="Camera Stopped")
+        self._photo = None
 
 def main():
     root = tk.Tk()
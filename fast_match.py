@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Fast Matching Kernels
+Shared helpers for matching probe encodings against the known encodings matrix
+"""
+
+import math
+import numpy as np
+
+# Numba is optional - fall back to blocked NumPy when it is not installed
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+# FAISS is optional - exact SIMD-optimized nearest-neighbour search for large libraries
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Below this many encodings a plain BLAS scan is already as fast as an index
+FAISS_MIN_ENCODINGS = 10000
+
+
+def quantize_int8(vectors):
+    """Quantize rows to int8 with a per-row scale; returns (codes, inverse_scales)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    peak = np.max(np.abs(vectors), axis=1)
+    scale = 127.0 / np.maximum(peak, 1e-12)
+    codes = np.round(vectors * scale[:, None]).astype(np.int8)
+    return codes, (1.0 / scale).astype(np.float32)
+
+
+def int8_shortlist(known_codes, known_inv_scale, probes, k, known_sq=None):
+    """Approximate dot products on int8 codes; returns the top-k candidate indices per probe.
+
+    With known_sq (squared norms of the unquantized rows) candidates are ranked by approximate
+    squared L2 instead of dot product, for vectors that are not unit length."""
+    probe_codes, probe_inv_scale = quantize_int8(probes)
+    approx = np.matmul(probe_codes, known_codes.T, dtype=np.int32) * probe_inv_scale[:, None] * known_inv_scale[None, :]
+    scores = -approx if known_sq is None else known_sq[None, :] - 2.0 * approx
+    k = min(k, known_codes.shape[0])
+    return np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+
+def build_l2_index(matrix):
+    """Build a FAISS IndexFlatL2 over the rows of matrix, or None when FAISS is unavailable or not worth it"""
+    if not FAISS_AVAILABLE or matrix.shape[0] < FAISS_MIN_ENCODINGS:
+        return None
+    index = faiss.IndexFlatL2(matrix.shape[1])
+    index.add(np.ascontiguousarray(matrix, dtype=np.float32))
+    return index
+
+
+def _l2_128(M, q, out):
+    """Squared L2 distance from q to every row of M, written into out (fixed d=128 so the inner loop vectorizes)"""
+    n = M.shape[0]
+    for i in prange(n):
+        s = 0.0
+        for k in range(128):
+            d = M[i, k] - q[k]
+            s += d * d
+        out[i] = s
+
+
+if NUMBA_AVAILABLE:
+    _l2_128 = njit(parallel=True, fastmath=True, cache=True)(_l2_128)
+
+
+def l2_128(M, q, out):
+    """Squared distances of one 128-d probe against a contiguous float32 (N, 128) matrix into a preallocated buffer"""
+    if NUMBA_AVAILABLE:
+        _l2_128(M, q, out)
+    else:
+        diff = M - q
+        np.einsum('ij,ij->i', diff, diff, out=out)
+    return out
+
+
+def _best_match(known, probe, tol2):
+    """Nearest known row to one probe by squared L2: (best_idx, best_d2, matched)"""
+    best_idx = -1
+    best_d2 = np.inf
+    for i in range(known.shape[0]):
+        s = 0.0
+        for k in range(known.shape[1]):
+            d = known[i, k] - probe[k]
+            s += d * d
+        if s < best_d2:
+            best_d2 = s
+            best_idx = i
+    return best_idx, best_d2, best_d2 <= tol2
+
+
+def _best_match_128(known, probe):
+    """_best_match with the dimension fixed at 128 so the inner loop unrolls into SIMD FMAs"""
+    best_idx = -1
+    best_d2 = np.inf
+    for i in range(known.shape[0]):
+        s = 0.0
+        for k in range(128):
+            d = known[i, k] - probe[k]
+            s += d * d
+        if s < best_d2:
+            best_d2 = s
+            best_idx = i
+    return best_idx, best_d2
+
+
+def _best_matches(known, probes, tol2, idx_out, d2_out):
+    """_best_match for every probe row, one probe per thread"""
+    for p in prange(probes.shape[0]):
+        idx, d2, _ = _best_match(known, probes[p], tol2)
+        idx_out[p] = idx
+        d2_out[p] = d2
+
+
+def _best_matches_128(known, probes, idx_out, d2_out):
+    """_best_match_128 for every probe row, one probe per thread"""
+    for p in prange(probes.shape[0]):
+        idx, d2 = _best_match_128(known, probes[p])
+        idx_out[p] = idx
+        d2_out[p] = d2
+
+
+if NUMBA_AVAILABLE:
+    _best_match = njit(cache=True, fastmath=True)(_best_match)
+    _best_match_128 = njit(cache=True, fastmath=True)(_best_match_128)
+    _best_matches = njit(parallel=True, cache=True, fastmath=True)(_best_matches)
+    _best_matches_128 = njit(parallel=True, cache=True, fastmath=True)(_best_matches_128)
+
+
+def best_matches(known, probes, tol2, known_sq=None):
+    """Nearest known encoding for each probe: (indices, squared distances, matched mask)"""
+    known = np.ascontiguousarray(known, dtype=np.float32)
+    probes = np.ascontiguousarray(np.atleast_2d(probes), dtype=np.float32)
+    if NUMBA_AVAILABLE:
+        idx = np.empty(probes.shape[0], dtype=np.int64)
+        d2 = np.empty(probes.shape[0], dtype=np.float64)
+        if known.shape[1] == 128:
+            _best_matches_128(known, probes, idx, d2)
+        else:
+            _best_matches(known, probes, tol2, idx, d2)
+    else:
+        if known_sq is None:
+            known_sq = np.einsum('ij,ij->i', known, known)
+        all_d2 = known_sq[None, :] + np.einsum('ij,ij->i', probes, probes)[:, None] - 2.0 * (probes @ known.T)
+        idx = np.argmin(all_d2, axis=1)
+        d2 = np.maximum(all_d2[np.arange(len(probes)), idx], 0.0)
+    return idx, d2, d2 <= tol2
+
+
+def _calibration_sums(E, labels):
+    """Stream all pairs once, accumulating count/sum/sum² for same-label and different-label distances"""
+    n, dim = E.shape
+    c_intra = 0.0
+    s_intra = 0.0
+    s2_intra = 0.0
+    c_inter = 0.0
+    s_inter = 0.0
+    s2_inter = 0.0
+    for i in prange(n):
+        for j in range(i + 1, n):
+            d = 0.0
+            for k in range(dim):
+                t = E[i, k] - E[j, k]
+                d += t * t
+            d = math.sqrt(d)
+            if labels[i] == labels[j]:
+                c_intra += 1.0
+                s_intra += d
+                s2_intra += d * d
+            else:
+                c_inter += 1.0
+                s_inter += d
+                s2_inter += d * d
+    return c_intra, s_intra, s2_intra, c_inter, s_inter, s2_inter
+
+
+if NUMBA_AVAILABLE:
+    _calibration_sums = njit(parallel=True, fastmath=True, cache=True)(_calibration_sums)
+
+
+def _calibration_sums_blocked(E, labels, block=256):
+    """NumPy fallback: same sums, one row block at a time so the N x N matrix is never materialized"""
+    n = E.shape[0]
+    sq = np.einsum('ij,ij->i', E, E)
+    sums = np.zeros(6)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        d2 = sq[start:stop, None] + sq[None, :] - 2.0 * (E[start:stop] @ E.T)
+        d = np.sqrt(np.maximum(d2, 0)).astype(np.float64)
+        upper = np.arange(n)[None, :] > np.arange(start, stop)[:, None]
+        same = labels[start:stop, None] == labels[None, :]
+        for offset, mask in ((0, same & upper), (3, ~same & upper)):
+            values = d[mask]
+            sums[offset:offset + 3] += (values.size, values.sum(), np.dot(values, values))
+    return tuple(sums)
+
+
+def calibration_stats(E, labels):
+    """Mean/std of intra-class and inter-class pairwise distances: (mean_intra, std_intra, n_intra, mean_inter, n_inter)"""
+    E = np.ascontiguousarray(E, dtype=np.float32)
+    labels = np.ascontiguousarray(labels, dtype=np.int32)
+    if NUMBA_AVAILABLE:
+        c_intra, s_intra, s2_intra, c_inter, s_inter, _ = _calibration_sums(E, labels)
+    else:
+        c_intra, s_intra, s2_intra, c_inter, s_inter, _ = _calibration_sums_blocked(E, labels)
+
+    mean_intra = float(s_intra / c_intra) if c_intra else 0.0
+    mean_inter = float(s_inter / c_inter) if c_inter else 0.0
+    std_intra = math.sqrt(max(s2_intra - c_intra * mean_intra * mean_intra, 0.0) / (c_intra - 1)) if c_intra > 1 else 0.1
+    return mean_intra, std_intra, int(c_intra), mean_inter, int(c_inter)
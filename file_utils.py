@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+File Utilities
+Fast JSON reads/writes and atomic writes so readers never see a half-written data file
+"""
+
+import json
+import os
+import tempfile
+
+# orjson is optional - several times faster than the stdlib for large files like encodings.json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# zstandard is optional - needed only to read or write compressed .json.zst files
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+def _json_default(obj):
+    """Serialize NumPy arrays/scalars with the stdlib encoder"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(data, indent=None) -> bytes:
+    """Serialize to UTF-8 bytes; NumPy arrays are written as lists (orjson supports indent=2 only)"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    # Compact separators unless pretty-printing - the stdlib default pads every comma with a space
+    separators = None if indent else (',', ':')
+    return json.dumps(data, indent=indent, separators=separators, default=_json_default).encode('utf-8')
+
+
+def load_json(path):
+    """Read and parse a JSON file (zstd-compressed when the name ends in .zst)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        data = zstandard.ZstdDecompressor().decompress(data)
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json(path, data, indent=None):
+    """Write data to a JSON file"""
+    with open(path, 'wb') as f:
+        f.write(dumps_json(data, indent))
+
+
+def atomic_write_json(path, data, indent=None):
+    """Write JSON to a temp file in the same directory, then os.replace it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps_json(data, indent))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compress_json_file(path, level=19):
+    """Replace path with a zstd-compressed path + '.zst' (written atomically); returns the new path"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressed_path = path + '.zst'
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.zst')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(zstandard.ZstdCompressor(level=level).compress(data))
+        os.replace(tmp_path, compressed_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.remove(path)
+    return compressed_path
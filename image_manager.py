@@ -7,34 +7,25 @@ Handles PhotoImage objects properly to prevent reference errors
 import tkinter as tk
 from PIL import Image, ImageTk
 import weakref
+import threading
+from collections import deque
 
 class ImageManager:
     """Manages PhotoImage references to prevent errors"""
-    _instance = None
-    _images = {}
-    _counter = 0
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    def __init__(self):
+        self._images = deque(maxlen=10)  # Keep only the last 10 images; the oldest drops off in O(1)
+        self._lock = threading.Lock()
     
     def create_photo_image(self, pil_image):
         """Create a PhotoImage with proper reference management"""
         try:
-            self._counter += 1
-            image_id = f"img_{self._counter}"
-            
             # Create PhotoImage
             photo = ImageTk.PhotoImage(pil_image)
             
             # Store reference
-            self._images[image_id] = photo
-            
-            # Clean up old images (keep only last 10)
-            if len(self._images) > 10:
-                oldest_key = list(self._images.keys())[0]
-                del self._images[oldest_key]
+            with self._lock:
+                self._images.append(photo)
             
             return photo
             
@@ -44,8 +35,8 @@ class ImageManager:
     
     def clear_all(self):
         """Clear all image references"""
-        self._images.clear()
-        self._counter = 0
+        with self._lock:
+            self._images.clear()
 
-# Global image manager instance
+# Global image manager instance - import this rather than constructing ImageManager
 image_manager = ImageManager()
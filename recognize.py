@@ -12,8 +12,13 @@ import numpy as np
 from datetime import datetime, date
 from PIL import Image, ImageTk
 import threading
+import queue
+import time
 import os
 from image_manager import image_manager
+from file_utils import atomic_write_json
+from encoding_cache import load_encoding_cache, save_encoding_cache, load_quantized_cache
+from fast_match import quantize_int8, int8_shortlist, build_l2_index, best_matches, NUMBA_AVAILABLE
 
 # Try to import face_recognition, handle gracefully if not available
 try:
@@ -33,15 +38,66 @@ class AttendanceRecognition:
         # Variables
         self.camera = None
         self.is_running = False
-        self.known_encodings = []
-        self.known_names = []
-        self.known_rolls = []
+        self.known_matrix = np.empty((0, 128), dtype=np.float32)
+        self.known_names = np.array([], dtype=object)
+        self.known_display_names = np.array([], dtype=object)
+        self.known_rolls = np.array([], dtype=object)
+        self.known_unit = np.empty((0, 128), dtype=np.float32)
+        self.index = None
         self.students_data = {}
         self.today_attendance = {}
+        # Marked-today flags indexed by roll position, plus each gallery row's roll position
+        self._roll_to_idx = {}
+        self._known_roll_idx = np.array([], dtype=np.int32)
+        self._marked_bits = np.zeros(0, dtype=bool)
+        self._already_marked_shown = {}  # roll -> monotonic time of its last "Already marked" update
         self.camera_label = None  # Initialize camera label
         
+        # Capture thread keeps only the latest frame; recognition always works on the newest one
+        self._latest_frame = None
+        self._frame_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._frame_wanted = threading.Event()
+        self._capture_thread = None
+        # A failed grab backs off instead of spinning; this many in a row means the camera is gone
+        self.grab_retry_delay = 0.05
+        self.max_failed_grabs = 40
+        
+        # Run detection + recognition on every (frame_skip + 1)th frame; faces barely move in between
+        self._frame_skip = 2
+        self._frame_idx = 0
+        
+        # Idle handling: after a run of empty frames, detect less often and redraw at most every 100 ms
+        self._no_face_streak = 0
+        self._idle_tick = 0
+        self._last_display_time = 0.0
+        
+        # Display buffers reused every frame: the worker draws into the BGR one and converts into
+        # the RGB one under a lock; the Tk thread pastes that into a single PhotoImage
+        self._display_bgr = np.empty((480, 640, 3), dtype=np.uint8)
+        self._display_rgb = np.empty((480, 640, 3), dtype=np.uint8)
+        self._display_lock = threading.Lock()
+        self._display_pending = False
+        self._photo = None
+        
+        # UI updates from the worker are coalesced: unchanged values are not re-set and list/stats
+        # refreshes run at most every 100 ms
+        self._var_values = {}
+        self._ui_last = 0.0
+        self._ui_refresh_pending = False
+        
+        # Attendance files are written by a background thread so disk latency never stalls recognition
+        self._save_q = queue.Queue()
+        self._save_thread = threading.Thread(target=self._save_worker, daemon=True)
+        self._save_thread.start()
+        
         # Recognition settings
         self.load_recognition_settings()
+        
+        # Int8 coarse matching: shortlist candidates on int8 codes, re-rank in float32.
+        # Only pays off with an int8-capable BLAS backend, so it is opt-in.
+        self.quantized_matching = False
+        self.rerank_candidates = 8
         self.face_locations = []
         self.face_encodings = []
         self.face_names = []
@@ -174,27 +230,74 @@ class AttendanceRecognition:
             with open('json_data/students.json', 'r') as f:
                 self.students_data = json.load(f)
             
-            # Load encodings
-            with open('json_data/encodings.json', 'r') as f:
-                encodings_data = json.load(f)
+            # Load encodings - memory-map the binary cache when it is current, otherwise parse
+            # the JSON once and rebuild the cache for next time
+            cache = load_encoding_cache('json_data')
+            if cache is not None:
+                matrix, offsets = cache
+                encodings_data = {roll: matrix[start:start + count] for roll, (start, count) in offsets.items()}
+            else:
+                with open('json_data/encodings.json', 'r') as f:
+                    encodings_data = json.load(f)
+                try:
+                    save_encoding_cache('json_data', encodings_data)
+                except Exception as e:
+                    print(f"⚠️  Could not write encoding cache: {e}")
             
             # Prepare arrays for face recognition
-            self.known_encodings = []
-            self.known_names = []
-            self.known_rolls = []
+            rows = []
+            names = []
+            display_names = []
+            rolls = []
+            cache_rows = []  # Row numbers in the cached matrix, to pick matching int8 codes
             
             for roll_number, encodings_list in encodings_data.items():
-                if roll_number in self.students_data:
+                if roll_number in self.students_data and len(encodings_list):
+                    if cache is not None:
+                        start, count = offsets[roll_number]
+                        cache_rows.append(np.arange(start, start + count))
                     student_info = self.students_data[roll_number]
                     student_name = student_info['name']
                     student_role = student_info.get('role', 'Student')
                     
-                    for encoding in encodings_list:
-                        self.known_encodings.append(np.array(encoding))
-                        self.known_names.append(f"{student_name} ({student_role})")
-                        self.known_rolls.append(roll_number)
+                    rows.append(np.asarray(encodings_list, dtype=np.float32).reshape(-1, 128))
+                    names.extend([f"{student_name} ({student_role})"] * len(encodings_list))
+                    display_names.extend([student_name] * len(encodings_list))
+                    rolls.extend([roll_number] * len(encodings_list))
+            
+            # One contiguous (N, 128) float32 matrix, scanned in a single pass per face
+            if rows:
+                self.known_matrix = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+            else:
+                self.known_matrix = np.empty((0, 128), dtype=np.float32)
+            self.known_names = np.array(names, dtype=object)
+            self.known_display_names = np.array(display_names, dtype=object)  # Name without role
+            self.known_rolls = np.array(rolls, dtype=object)
+            
+            # Each row's roll as an index into the marked-today bitset
+            self._roll_to_idx = {roll: i for i, roll in enumerate(dict.fromkeys(rolls))}
+            self._known_roll_idx = np.array([self._roll_to_idx[roll] for roll in rolls], dtype=np.int32)
+            self._marked_bits = np.zeros(len(self._roll_to_idx), dtype=bool)
+            
+            # L2-normalized copy so matching is a dot product (||a-b||² = 2 - 2cosθ on unit vectors)
+            norms = np.linalg.norm(self.known_matrix, axis=1, keepdims=True)
+            self.known_unit = np.ascontiguousarray(self.known_matrix / np.maximum(norms, 1e-12), dtype=np.float32)
+            
+            # Int8 codes of the unit vectors (4x less memory traffic for the coarse pass). Per-row
+            # codes do not change under normalization, so stored codes from training are reused
+            # and only their scales are divided by the row norms
+            stored = load_quantized_cache('json_data') if cache is not None else None
+            if stored is not None and len(stored[0]) == len(matrix):
+                row_idx = np.concatenate(cache_rows) if cache_rows else np.empty(0, dtype=np.int64)
+                self.known_q = np.ascontiguousarray(stored[0][row_idx])
+                self.known_q_inv_scale = (stored[1][row_idx] / np.maximum(norms[:, 0], 1e-12)).astype(np.float32)
+            else:
+                self.known_q, self.known_q_inv_scale = quantize_int8(self.known_unit)
+            
+            # FAISS index over the unit vectors for large rosters (None for small ones)
+            self.index = build_l2_index(self.known_unit)
             
-            print(f"Loaded {len(self.known_encodings)} face encodings for {len(self.students_data)} students")
+            print(f"Loaded {len(self.known_matrix)} face encodings for {len(self.students_data)} students")
             
             if not FACE_RECOGNITION_AVAILABLE:
                 print("⚠️  Running in demo mode - face recognition will be simulated")
@@ -219,29 +322,32 @@ class AttendanceRecognition:
         except Exception as e:
             print(f"Error loading attendance: {e}")
             self.today_attendance = {}
+        
+        # Rolls already marked today, checked on every recognized frame
+        self._marked_bits[:] = False
+        for roll in self.today_attendance:
+            if roll in self._roll_to_idx:
+                self._marked_bits[self._roll_to_idx[roll]] = True
     
     def save_attendance(self, roll_number, student_name):
         """Save attendance for a student"""
         today = date.today().strftime("%Y-%m-%d")
         current_time = datetime.now().strftime("%H:%M:%S")
         
-        # Create attendance directory if it doesn't exist
-        os.makedirs("attendance", exist_ok=True)
-        
         attendance_file = f"attendance/{today}.json"
         
-        # Add to today's attendance
+        # Add to today's attendance - in memory right away so the next frame sees it
+        if roll_number in self._roll_to_idx:
+            self._marked_bits[self._roll_to_idx[roll_number]] = True
         self.today_attendance[roll_number] = {
             "name": student_name,
             "time": current_time,
             "date": today
         }
         
-        # Save to file
+        # Hand a snapshot to the save thread
         try:
-            with open(attendance_file, 'w') as f:
-                json.dump(self.today_attendance, f, indent=2)
-            
+            self._save_q.put((attendance_file, dict(self.today_attendance)))
             print(f"Attendance saved for {student_name} ({roll_number}) at {current_time}")
             return True
             
@@ -249,6 +355,37 @@ class AttendanceRecognition:
             print(f"Error saving attendance: {e}")
             return False
     
+    def _save_worker(self):
+        """Write queued attendance snapshots; a burst of marks collapses into one write of the newest"""
+        while True:
+            item = self._save_q.get()
+            if item is None:
+                return
+            
+            pending = {}
+            stop = False
+            while item is not None:
+                attendance_file, snapshot = item
+                pending[attendance_file] = snapshot
+                try:
+                    item = self._save_q.get_nowait()
+                except queue.Empty:
+                    item = None
+                else:
+                    if item is None:
+                        stop = True
+            
+            for attendance_file, snapshot in pending.items():
+                try:
+                    # Create attendance directory if it doesn't exist
+                    os.makedirs(os.path.dirname(attendance_file), exist_ok=True)
+                    atomic_write_json(attendance_file, snapshot, indent=2)
+                except Exception as e:
+                    print(f"Error saving attendance: {e}")
+            
+            if stop:
+                return
+    
     def load_recognition_settings(self):
         """Load face recognition settings from config file"""
         try:
@@ -273,10 +410,23 @@ class AttendanceRecognition:
             self.recognition_threshold = 0.4
             self.min_face_confidence = 0.7
             self.face_detection_model = 'hog'
+        
+        # With a CUDA build of dlib the CNN detector runs on the GPU - faster than HOG on the CPU and more accurate
+        if self.face_detection_model == 'hog' and FACE_RECOGNITION_AVAILABLE:
+            try:
+                import dlib
+                if dlib.DLIB_USE_CUDA:
+                    self.face_detection_model = 'cnn'
+                    print("🚀 CUDA-enabled dlib detected - using CNN face detection on the GPU")
+            except (ImportError, AttributeError):
+                pass
+        
+        # Euclidean tolerance expressed as a cosine-similarity threshold on unit vectors
+        self.cosine_threshold = 1.0 - (self.recognition_threshold ** 2) / 2.0
     
     def start_recognition(self):
         """Start face recognition"""
-        if len(self.known_encodings) == 0:
+        if len(self.known_matrix) == 0:
             messagebox.showerror("Error", "No trained data found. Please train the model first.")
             return
         
@@ -286,11 +436,26 @@ class AttendanceRecognition:
                 messagebox.showerror("Error", "Failed to open camera")
                 return
             
+            # Compressed MJPG at a fixed 640x480 avoids per-frame YUYV conversion of large frames,
+            # and a one-frame driver buffer keeps reads current (drivers ignore unsupported values)
+            self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.camera.set(cv2.CAP_PROP_FPS, 30)
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
             self.is_running = True
             self.start_btn.config(state='disabled')
             self.stop_btn.config(state='normal')
             
-            self.status_var.set("Recognition started - Show your face to camera")
+            self._set_var(self.status_var, "Recognition started - Show your face to camera")
+            
+            # Capture and recognition run on separate threads so slow frames never back up the camera
+            self._latest_frame = None
+            self._frame_ready.clear()
+            self._frame_wanted.clear()
+            self._capture_thread = threading.Thread(target=self.capture_loop, args=(self.camera,), daemon=True)
+            self._capture_thread.start()
             
             # Start recognition in separate thread
             thread = threading.Thread(target=self.recognition_loop)
@@ -300,13 +465,54 @@ class AttendanceRecognition:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start recognition: {str(e)}")
     
+    def capture_loop(self, camera):
+        """Drain the driver queue continuously; decode a frame only when recognition asks for one"""
+        failed_grabs = 0
+        while self.is_running:
+            # grab() dequeues without decoding, so frames queued while the detector was busy
+            # are dropped cheaply and the next retrieve() is always the newest one
+            if not camera.grab():
+                failed_grabs += 1
+                if failed_grabs >= self.max_failed_grabs:
+                    self.root.after(0, self.on_camera_lost, camera)
+                    return
+                time.sleep(self.grab_retry_delay)
+                continue
+            failed_grabs = 0
+            if not self._frame_wanted.is_set():
+                continue
+            
+            ret, frame = camera.retrieve()
+            if not ret:
+                continue
+            
+            self._frame_wanted.clear()
+            with self._frame_lock:
+                self._latest_frame = frame
+            self._frame_ready.set()
+    
+    def on_camera_lost(self, camera):
+        """The capture thread gave up on a camera that stopped delivering frames (Tk thread)"""
+        if not self.is_running or self.camera is not camera:
+            return
+        self.stop_recognition()
+        self._set_var(self.status_var, "Camera stopped delivering frames - check the connection and start again")
+    
     def recognition_loop(self):
         """Main recognition loop"""
         demo_counter = 0  # Counter for demo mode
         
         while self.is_running and self.camera is not None:
-            ret, frame = self.camera.read()
-            if not ret:
+            # Ask for a frame only once we are ready for it, so it is decoded from the newest grab;
+            # anything captured while we were busy was grabbed and dropped
+            self._frame_wanted.set()
+            if not self._frame_ready.wait(timeout=0.1):
+                continue
+            with self._frame_lock:
+                frame = self._latest_frame
+                self._latest_frame = None
+                self._frame_ready.clear()
+            if frame is None:
                 continue
             
             if not FACE_RECOGNITION_AVAILABLE:
@@ -319,73 +525,120 @@ class AttendanceRecognition:
                 self.display_frame_with_recognition(frame)
                 continue
             
+            # Skipped frames are displayed with the previous frame's boxes and names
+            process_frame = self._frame_idx % (self._frame_skip + 1) == 0
+            self._frame_idx += 1
+            if not process_frame:
+                self.display_frame_with_recognition(frame)
+                continue
+            
+            # Nobody in view for a while - only look for faces on every third processed frame
+            if self._no_face_streak > 10:
+                self._idle_tick += 1
+                if self._idle_tick % 3:
+                    self.display_frame_with_recognition(frame)
+                    continue
+            
             # Real face recognition mode
-            # Resize frame for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+            # Quarter-size frame for faster processing (two pyrDown halvings, same 4x factor as before)
+            small_frame = cv2.pyrDown(cv2.pyrDown(frame))
             rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
             
             # Find faces in current frame using calibrated settings
             self.face_locations = face_recognition.face_locations(rgb_small_frame, model=self.face_detection_model)
             
-            # Only process if faces are found
-            if len(self.face_locations) > 0:
-                self.face_encodings = face_recognition.face_encodings(rgb_small_frame, self.face_locations)
-            else:
+            # No faces: skip encoding and matching entirely
+            if len(self.face_locations) == 0:
+                self._no_face_streak += 1
                 self.face_encodings = []
+                self.face_names = []
+                self.display_frame_with_recognition(frame)
+                continue
+            
+            self._no_face_streak = 0
+            self._idle_tick = 0
+            self.face_encodings = face_recognition.face_encodings(rgb_small_frame, self.face_locations)
             
             self.face_names = []
             
-            for face_encoding in self.face_encodings:
-                # Compare with known faces
-                matches = face_recognition.compare_faces(self.known_encodings, face_encoding, 
-                                                       tolerance=self.recognition_threshold)
+            # Match every face in the frame against the gallery in one batch
+            best_indices, best_similarities = self.match_faces(self.face_encodings)
+            
+            for i in range(len(self.face_encodings)):
                 name = "Unknown"
                 roll = "Unknown"
                 
-                # Use the known face with the smallest distance
-                face_distances = face_recognition.face_distance(self.known_encodings, face_encoding)
+                best_match_index = int(best_indices[i])
+                best_similarity = float(best_similarities[i])
+                best_distance = float(np.sqrt(max(2.0 - 2.0 * best_similarity, 0.0)))
                 
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
+                # Check if the best match is good enough
+                if best_similarity > self.cosine_threshold:
+                    name = self.known_display_names[best_match_index]
+                    roll = self.known_rolls[best_match_index]
                     
-                    # Additional validation: check if the best match is good enough
-                    if matches[best_match_index] and face_distances[best_match_index] < self.recognition_threshold:
-                        # Extract name without role for matching
-                        full_name = self.known_names[best_match_index]
-                        if "(" in full_name and ")" in full_name:
-                            name = full_name.split(" (")[0]  # Get name without role
-                        else:
-                            name = full_name
-                        roll = self.known_rolls[best_match_index]
-                        
-                        # Double-check: ensure this is a confident match
-                        confidence = 1.0 - face_distances[best_match_index]
-                        if confidence < self.min_face_confidence:
-                            name = "Unknown (Low Confidence)"
-                            roll = "Unknown"
-                        else:
-                            # Mark attendance if not already marked today
-                            if roll not in self.today_attendance:
-                                if self.save_attendance(roll, name):
-                                    self.status_var.set(f"✅ Attendance marked for {name} ({roll}) - Confidence: {confidence:.2f}")
-                                    self.last_recognition_var.set(f"Last Recognition: {name}")
-                                    # Update GUI in main thread
-                                    self.root.after(0, self.refresh_attendance_list)
-                                    self.root.after(0, self.update_stats)
-                                else:
-                                    self.status_var.set(f"Failed to save attendance for {name}")
-                            else:
-                                self.status_var.set(f"Already marked: {name} ({roll})")
-                                self.last_recognition_var.set(f"Last Recognition: {name} (Already marked)")
-                    else:
-                        name = "Unknown (Poor Match)"
+                    # Double-check: ensure this is a confident match
+                    confidence = 1.0 - best_distance
+                    if confidence < self.min_face_confidence:
+                        name = "Unknown (Low Confidence)"
                         roll = "Unknown"
+                    else:
+                        # Mark attendance if not already marked today
+                        if not self._marked_bits[self._known_roll_idx[best_match_index]]:
+                            if self.save_attendance(roll, name):
+                                self._set_var(self.status_var, f"✅ Attendance marked for {name} ({roll}) - Confidence: {confidence:.2f}")
+                                self._set_var(self.last_recognition_var, f"Last Recognition: {name}")
+                                # Update GUI in main thread
+                                self.schedule_ui_refresh()
+                            else:
+                                self._set_var(self.status_var, f"Failed to save attendance for {name}")
+                        else:
+                            # Same person stays in view for many frames - refresh their status at most every 2 s
+                            now = time.monotonic()
+                            if now - self._already_marked_shown.get(roll, 0.0) >= 2.0:
+                                self._already_marked_shown[roll] = now
+                                self._set_var(self.status_var, f"Already marked: {name} ({roll})")
+                                self._set_var(self.last_recognition_var, f"Last Recognition: {name} (Already marked)")
+                else:
+                    name = "Unknown (Poor Match)"
+                    roll = "Unknown"
                 
                 self.face_names.append(f"{name} ({roll})")
             
             # Display the results
             self.display_frame_with_recognition(frame)
     
+    def match_faces(self, face_encodings):
+        """Best gallery match for each face: (indices, cosine similarities), one batched call"""
+        if len(face_encodings) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        P = np.ascontiguousarray(np.stack(face_encodings), dtype=np.float32)
+        P /= np.maximum(np.linalg.norm(P, axis=1, keepdims=True), 1e-12)
+        rows = np.arange(len(P))
+        
+        if self.index is not None:
+            # FAISS returns squared L2 on unit vectors, i.e. 2 - 2cosθ
+            D, I = self.index.search(P, 1)
+            return I[:, 0], 1.0 - D[:, 0] / 2.0
+        
+        if self.quantized_matching:
+            # Coarse int8 shortlist, then exact float32 re-rank to keep thresholds accurate
+            candidates = int8_shortlist(self.known_q, self.known_q_inv_scale, P, self.rerank_candidates)
+            candidate_sims = np.einsum('kd,kcd->kc', P, self.known_unit[candidates])
+            best_positions = np.argmax(candidate_sims, axis=1)
+            return candidates[rows, best_positions], candidate_sims[rows, best_positions]
+        
+        if NUMBA_AVAILABLE:
+            # Fused distance + argmin kernel, no (K, N) temporary; squared L2 on unit vectors is 2 - 2cosθ
+            best_indices, best_d2, _ = best_matches(self.known_unit, P, 0.0)
+            return best_indices, 1.0 - best_d2 / 2.0
+        
+        # (K, N) cosine similarities with one SGEMM on the normalized gallery
+        similarities = P @ self.known_unit.T
+        best_indices = np.argmax(similarities, axis=1)
+        return best_indices, similarities[rows, best_indices]
+    
     def simulate_recognition(self):
         """Simulate face recognition for demo purposes"""
         if not self.students_data:
@@ -399,65 +652,105 @@ class AttendanceRecognition:
         # Check if already marked today
         if roll_number not in self.today_attendance:
             if self.save_attendance(roll_number, student_name):
-                self.status_var.set(f"[DEMO] Attendance marked for {student_name} ({roll_number})")
-                self.last_recognition_var.set(f"Last Recognition: {student_name} (Demo)")
+                self._set_var(self.status_var, f"[DEMO] Attendance marked for {student_name} ({roll_number})")
+                self._set_var(self.last_recognition_var, f"Last Recognition: {student_name} (Demo)")
                 # Update GUI in main thread
-                self.root.after(0, self.refresh_attendance_list)
-                self.root.after(0, self.update_stats)
+                self.schedule_ui_refresh()
             else:
-                self.status_var.set(f"[DEMO] Failed to save attendance for {student_name}")
+                self._set_var(self.status_var, f"[DEMO] Failed to save attendance for {student_name}")
         else:
-            self.status_var.set(f"[DEMO] Already marked: {student_name} ({roll_number})")
-            self.last_recognition_var.set(f"Last Recognition: {student_name} (Already marked)")
+            self._set_var(self.status_var, f"[DEMO] Already marked: {student_name} ({roll_number})")
+            self._set_var(self.last_recognition_var, f"Last Recognition: {student_name} (Already marked)")
+    
+    def _set_var(self, var, value):
+        """Set a Tk variable only when its value actually changes"""
+        key = str(var)
+        if self._var_values.get(key) != value:
+            self._var_values[key] = value
+            var.set(value)
+    
+    def schedule_ui_refresh(self):
+        """Refresh the attendance list and stats on the Tk thread, at most every 100 ms"""
+        if self._ui_refresh_pending:
+            return
+        self._ui_refresh_pending = True
+        delay_ms = max(0, int((0.1 - (time.monotonic() - self._ui_last)) * 1000))
+        self.root.after(delay_ms, self._flush_ui)
+    
+    def _flush_ui(self):
+        """Run one coalesced list/stats refresh"""
+        self._ui_refresh_pending = False
+        self._ui_last = time.monotonic()
+        self.refresh_attendance_list()
+        self.update_stats()
     
     def display_frame_with_recognition(self, frame):
         """Display frame with recognition results"""
         try:
-            # Scale back up face locations
+            # Nobody in view for a while: keep the last image unless it is more than 100 ms old
+            now = time.monotonic()
+            if self._no_face_streak > 10 and now - self._last_display_time < 0.1:
+                return
+            self._last_display_time = now
+            
+            # Resize first, then draw on the 640x480 display image rather than the full camera frame
+            height, width = frame.shape[:2]
+            display = cv2.resize(frame, (640, 480), dst=self._display_bgr)
+            
+            # Detection ran at quarter size: scale locations x4 to the frame, then to the display
+            scale_x = 4 * 640 / width
+            scale_y = 4 * 480 / height
             for (top, right, bottom, left), name in zip(self.face_locations, self.face_names):
-                top *= 4
-                right *= 4
-                bottom *= 4
-                left *= 4
+                top = int(top * scale_y)
+                right = int(right * scale_x)
+                bottom = int(bottom * scale_y)
+                left = int(left * scale_x)
                 
                 # Choose color based on recognition
                 if "Unknown" in name:
                     color = (0, 0, 255)  # Red for unknown
-                elif "Already marked" in self.status_var.get():
+                elif "Already marked" in self._var_values.get(str(self.status_var), ''):
                     color = (255, 165, 0)  # Orange for already marked
                 else:
                     color = (0, 255, 0)  # Green for newly recognized
                 
                 # Draw rectangle around face
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                cv2.rectangle(display, (left, top), (right, bottom), color, 2)
                 
                 # Draw label
-                cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+                cv2.rectangle(display, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
                 font = cv2.FONT_HERSHEY_DUPLEX
-                cv2.putText(frame, name, (left + 6, bottom - 6), font, 0.6, (255, 255, 255), 1)
-            
-            # Convert to display format
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_resized = cv2.resize(frame_rgb, (640, 480))
+                cv2.putText(display, name, (left + 6, bottom - 6), font, 0.6, (255, 255, 255), 1)
             
-            # Convert to PhotoImage using image manager
-            pil_image = Image.fromarray(frame_resized)
-            photo = image_manager.create_photo_image(pil_image)
+            # Convert to display format into the shared buffer; post one update at a time
+            with self._display_lock:
+                cv2.cvtColor(display, cv2.COLOR_BGR2RGB, dst=self._display_rgb)
+                post_update = not self._display_pending
+                self._display_pending = True
             
-            if photo:
+            if post_update:
                 # Update label in main thread
-                self.root.after(0, self.update_camera_display, photo)
+                self.root.after(0, self.update_camera_display)
             
         except Exception as e:
             print(f"Error displaying frame: {e}")
             # Continue without crashing
     
-    def update_camera_display(self, photo):
-        """Update camera display with new frame"""
+    def update_camera_display(self):
+        """Update camera display with the latest frame (Tk thread)"""
         try:
-            if self.camera_label and photo:
-                self.camera_label.configure(image=photo)
-                self.camera_label.image = photo  # Keep a reference
+            with self._display_lock:
+                self._display_pending = False
+                if not self.is_running or not self.camera_label:
+                    return
+                pil_image = Image.fromarray(self._display_rgb)
+                if self._photo is None:
+                    self._photo = ImageTk.PhotoImage(pil_image)
+                    self.camera_label.configure(image=self._photo)
+                    self.camera_label.image = self._photo  # Keep a reference
+                else:
+                    # Paste into the existing Tk image instead of allocating a new one per frame
+                    self._photo.paste(pil_image)
         except tk.TclError:
             # Handle case where window was closed
             pass
@@ -466,6 +759,11 @@ class AttendanceRecognition:
         """Stop face recognition"""
         self.is_running = False
         
+        # Let the capture thread leave camera.read() before the camera is released
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=1.0)
+            self._capture_thread = None
+        
         if self.camera:
             self.camera.release()
             self.camera = None
@@ -475,7 +773,8 @@ class AttendanceRecognition:
         
         # Clear camera display
         self.camera_label.configure(image='', text="Recognition Stopped")
-        self.status_var.set("Recognition stopped")
+        self._photo = None
+        self._set_var(self.status_var, "Recognition stopped")
     
     def refresh_data(self):
         """Refresh encodings and attendance data"""
@@ -483,7 +782,7 @@ class AttendanceRecognition:
         self.load_today_attendance()
         self.update_stats()
         self.refresh_attendance_list()
-        self.status_var.set("Data refreshed successfully")
+        self._set_var(self.status_var, "Data refreshed successfully")
     
     def update_stats(self):
         """Update statistics display"""
@@ -509,6 +808,9 @@ class AttendanceRecognition:
             self.stop_recognition()
             if self.camera:
                 self.camera.release()
+            # Flush pending attendance writes before exiting
+            self._save_q.put(None)
+            self._save_thread.join(timeout=5.0)
             image_manager.clear_all()  # Clear image references
             self.root.destroy()
         except Exception as e:
@@ -7,12 +7,16 @@ Handles student registration with face capture and data storage
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import cv2
-import json
+import numpy as np
 import os
 from datetime import datetime
 from PIL import Image, ImageTk
 import threading
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from image_manager import image_manager
+from file_utils import load_json, dump_json
 
 class StudentRegistration:
     def __init__(self, root):
@@ -31,9 +35,68 @@ class StudentRegistration:
         self.max_images = 20  # Increased to 20 images
         self.capture_delay = 400  # Reduced delay for faster capture
         self.auto_workflow_active = False
+        self._student_dir = None
+        self._student_dir_key = None
+        
+        # students.json is parsed once; roll-number checks and registrations use this copy
+        self._students = self.load_students()
+        
+        # Kept open briefly after Stop so a quick restart skips device enumeration; released after
+        # camera_idle_release_ms, or at once when the window is minimized/withdrawn, so Attendance and
+        # the Calibrator can open camera 0. self.camera is set while capturing
+        self._camera_handle = None
+        self.camera_idle_release_ms = 15000
+        self._idle_release_id = None
+        
+        # Camera reads happen on a capture thread; the Tk loop only shows the newest frame
+        self.frame_q = queue.Queue(maxsize=1)
+        self.cap_thread = None
+        self._last_frame = None
+        # Set when the preview wants another frame; other grabbed frames are never decoded
+        self.need_frame = threading.Event()
+        # Set by the capture thread once a frame with a face arrives; the auto workflow starts on it
+        self._first_frame = threading.Event()
+        self.max_warmup_ms = 5000
+        # Preview-only frames are decoded into two alternating buffers instead of new arrays
+        self._ring = []
+        self._ring_idx = 0
+        # A failed grab backs off instead of spinning; this many in a row means the camera is gone
+        self.grab_retry_delay = 0.05
+        self.max_failed_grabs = 40
+        
+        # Preview buffer reused every tick; PIL reads it as BGR directly, so no RGB copy is made
+        self._small_bgr = np.empty((300, 400, 3), dtype=np.uint8)
+        self._photo = None
+        
+        # Quality gate for auto capture: keep only sharp frames with exactly one reasonably sized face
+        self.min_face_size = 100
+        self.blur_threshold = 100.0
+        self.max_rejected_frames = 150
+        self._rejected_frames = 0
+        # CascadeClassifier is not thread-safe: each thread borrows one from the pool and returns it
+        self._cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self._det_pool = queue.Queue()
+        self._cascade_available = self.return_face_cascade(self.load_face_cascade())
+        
+        # Auto-capture pipeline state; the session number discards verdicts from a finished session
+        self._detect_q = None
+        self._pipeline_session = 0
+        
+        # Opt-in: keep an auto-capture session in memory and save it as one frames.npy stack
+        # (one sequential write) instead of one JPEG per image
+        self.save_frame_stack = False
+        self._frame_stack = None
+        
+        # Captured images are JPEG-encoded and written on a thread pool (cv2.imencode releases the GIL)
+        self.writer_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                              thread_name_prefix='image-writer')
+        self.pending_writes = []
+        # Encode parameters built once; Huffman optimization costs encode time for a few % of size
+        self._jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
         
         # Bind cleanup to window close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.bind("<Unmap>", self._on_unmap, add='+')
         
         # Create main frame
         main_frame = ttk.Frame(root, padding="20")
@@ -45,6 +108,63 @@ class StudentRegistration:
         
         self.create_widgets(main_frame)
         
+    def load_students(self):
+        """Load registered students, or an empty dict if none are registered yet"""
+        try:
+            return load_json('json_data/students.json')
+        except FileNotFoundError:
+            return {}
+        
+    def load_face_cascade(self):
+        """Load OpenCV's frontal face Haar cascade, or None if this build does not ship it"""
+        try:
+            cascade = cv2.CascadeClassifier(self._cascade_path)
+            if not cascade.empty():
+                return cascade
+        except Exception as e:
+            print(f"⚠️  Face cascade not available: {e}")
+        print("⚠️  Auto capture will save frames without face checks")
+        return None
+    
+    def borrow_face_cascade(self):
+        """Take an idle detector from the pool, loading a new one only when all are in use"""
+        try:
+            return self._det_pool.get_nowait()
+        except queue.Empty:
+            return cv2.CascadeClassifier(self._cascade_path)
+    
+    def return_face_cascade(self, cascade):
+        """Put a detector back in the pool; returns False for a missing detector"""
+        if cascade is None:
+            return False
+        self._det_pool.put(cascade)
+        return True
+    
+    def detect_faces(self, gray):
+        """Haar-cascade face boxes in a grayscale frame, using a pooled detector"""
+        cascade = self.borrow_face_cascade()
+        try:
+            return cascade.detectMultiScale(gray, 1.2, 5, minSize=(self.min_face_size, self.min_face_size))
+        finally:
+            self.return_face_cascade(cascade)
+    
+    def check_frame_quality(self, frame):
+        """Return None if the frame is usable for training, otherwise the reason it was rejected"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        if self._cascade_available:
+            faces = self.detect_faces(gray)
+            if len(faces) == 0:
+                return "No face detected - please look at the camera"
+            if len(faces) > 1:
+                return "Multiple faces detected - only one person should be in view"
+        
+        # Variance of the Laplacian drops sharply on motion blur
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.blur_threshold:
+            return "Image too blurry - please hold still"
+        
+        return None
+    
     def create_widgets(self, parent):
         """Create and arrange widgets"""
         # Title
@@ -175,12 +295,13 @@ class StudentRegistration:
     def start_camera(self):
         """Start camera preview"""
         try:
-            self.camera = cv2.VideoCapture(0)
+            self.camera = self.open_camera()
             if not self.camera.isOpened():
                 messagebox.showerror("Error", "Failed to open camera")
                 return
                 
             self.is_capturing = True
+            self.start_capture_thread()
             self.start_btn.config(state='disabled')
             self.capture_btn.config(state='normal')
             self.manual_capture_btn.config(state='normal')
@@ -192,28 +313,151 @@ class StudentRegistration:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
     
+    def open_camera(self):
+        """Open the default camera as MJPG 640x480 with a one-frame driver buffer.
+        
+        The handle stays open for a short while after stop so a restart skips device
+        enumeration (see release_camera).
+        """
+        self._cancel_idle_release()
+        if self._camera_handle is not None and self._camera_handle.isOpened():
+            return self._camera_handle
+        
+        camera = cv2.VideoCapture(0)
+        if camera.isOpened():
+            self._camera_handle = camera
+            # A one-frame buffer keeps captures current; MJPG avoids YUYV conversion in the driver
+            # (drivers ignore values they do not support)
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            camera.set(cv2.CAP_PROP_FPS, 30)
+        return camera
+    
+    def start_capture_thread(self):
+        """Start the background thread that reads frames from the camera"""
+        self._last_frame = None
+        while not self.frame_q.empty():
+            self.frame_q.get_nowait()
+        self.need_frame.set()
+        self._first_frame.clear()
+        self._ring = []
+        self.cap_thread = threading.Thread(target=self._capture_loop, args=(self.camera,), daemon=True)
+        self.cap_thread.start()
+    
+    def current_frame(self):
+        """Latest frame, copied if it lives in a preview buffer the capture thread will reuse"""
+        frame = self._last_frame
+        if frame is not None and any(frame is slot for slot in self._ring):
+            frame = frame.copy()
+        return frame
+    
+    def _capture_loop(self, camera):
+        """Grab frames continuously, decoding only those the preview or auto capture will use"""
+        failed_grabs = 0
+        while self.is_capturing:
+            # grab() dequeues without decoding; retrieve() pays for the decode only when needed
+            if not camera.grab():
+                failed_grabs += 1
+                if failed_grabs >= self.max_failed_grabs:
+                    self.root.after(0, self.on_camera_lost, camera)
+                    return
+                time.sleep(self.grab_retry_delay)
+                continue
+            failed_grabs = 0
+            if not (self.need_frame.is_set() or self.auto_capture_active):
+                continue
+            
+            # Frames auto capture may save get their own array. Preview frames reuse two buffers:
+            # one is written only after the preview has taken the other (need_frame)
+            if self.auto_capture_active or not self._ring:
+                ret, frame = camera.retrieve()
+                if ret and not self._ring:
+                    self._ring = [np.empty_like(frame), np.empty_like(frame)]
+            else:
+                self._ring_idx ^= 1
+                ret, frame = camera.retrieve(self._ring[self._ring_idx])
+            if not ret:
+                continue
+            
+            self.need_frame.clear()
+            self._last_frame = frame
+            
+            # The auto workflow waits for the first frame that shows a face
+            if self.auto_workflow_active and not self._first_frame.is_set():
+                if not self._cascade_available or len(self.detect_faces(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))):
+                    self._first_frame.set()
+            try:
+                self.frame_q.get_nowait()
+            except queue.Empty:
+                pass
+            self.frame_q.put(frame)
+    
+    def on_camera_lost(self, camera):
+        """The capture thread gave up on a camera that stopped delivering frames (Tk thread)"""
+        if not self.is_capturing or self._camera_handle is not camera:
+            return
+        self.stop_camera()
+        self.release_camera()
+        self.status_var.set("Camera stopped delivering frames - check the connection and start it again")
+    
+    def queue_image_write(self, image_path, frame):
+        """Encode and write a captured frame in the background"""
+        self.pending_writes.append(self.writer_pool.submit(self._write_image, image_path, frame))
+    
+    def wait_for_writes(self):
+        """Block until every queued capture is on disk"""
+        wait(self.pending_writes)
+        self.pending_writes = []
+    
+    def _write_frame_stack(self, stack_path, frames):
+        """Write a session's frames as one (N, H, W, 3) uint8 .npy file"""
+        try:
+            np.save(stack_path, frames)
+        except Exception as e:
+            print(f"❌ Failed to write {stack_path}: {e}")
+    
+    def _write_image(self, image_path, frame):
+        """Encode one capture to JPEG and write it"""
+        try:
+            ok, encoded = cv2.imencode('.jpg', frame, self._jpeg_params)
+            if ok:
+                with open(image_path, 'wb', buffering=1 << 20) as f:
+                    f.write(encoded)  # Written straight from the array's buffer, no bytes copy
+            else:
+                print(f"❌ Failed to encode {image_path}")
+        except Exception as e:
+            print(f"❌ Failed to write {image_path}: {e}")
+    
     def update_camera_preview(self):
         """Update camera preview continuously"""
         if self.is_capturing and self.camera is not None:
             try:
-                ret, frame = self.camera.read()
-                if ret:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                try:
+                    frame = self.frame_q.get_nowait()
+                    self.need_frame.set()
+                except queue.Empty:
+                    frame = None
+                if frame is not None:
                     # Resize for preview
-                    frame_resized = cv2.resize(frame_rgb, (400, 300))
+                    cv2.resize(frame, (400, 300), dst=self._small_bgr)
                     
-                    # Convert to PIL Image and then to PhotoImage using image manager
-                    pil_image = Image.fromarray(frame_resized)
-                    photo = image_manager.create_photo_image(pil_image)
+                    # PIL swaps BGR to RGB while decoding the buffer; show it through a single PhotoImage
+                    pil_image = Image.frombuffer('RGB', (400, 300), self._small_bgr, 'raw', 'BGR', 0, 1)
                     
                     # Update label
-                    if self.preview_label and photo:
-                        self.preview_label.configure(image=photo)
-                        self.preview_label.image = photo  # Keep a reference
+                    if self.preview_label:
+                        if self._photo is None:
+                            self._photo = ImageTk.PhotoImage(pil_image)
+                            self.preview_label.configure(image=self._photo)
+                            self.preview_label.image = self._photo  # Keep a reference
+                        else:
+                            # Paste into the existing Tk image instead of allocating a new one per frame
+                            self._photo.paste(pil_image)
                         
-                # Schedule next update
-                self.root.after(10, self.update_camera_preview)
+                # Schedule next update - ~30 fps matches the camera; the capture thread runs independently
+                self.root.after(33, self.update_camera_preview)
             except Exception as e:
                 print(f"Error updating camera preview: {e}")
                 # Continue without crashing
@@ -234,6 +478,14 @@ class StudentRegistration:
         
         return student_dir
     
+    def get_student_dir(self):
+        """Role-based directory for the roll/role in the form, created once and cached"""
+        key = (self.roll_var.get().strip(), self.role_var.get().strip())
+        if key != self._student_dir_key:
+            self._student_dir = self.create_role_based_directory(*key)
+            self._student_dir_key = key
+        return self._student_dir
+    
     def start_auto_capture(self):
         """Start automatic image capture"""
         if not self.camera or not self.is_capturing:
@@ -248,6 +500,10 @@ class StudentRegistration:
         self.auto_capture_active = True
         self.capture_count = 0
         self.captured_images = []
+        self.get_student_dir()  # Directory for the whole session, created up front
+        self._session_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._rejected_frames = 0
+        self.start_capture_pipeline()
         
         # Disable capture button during auto capture
         self.capture_btn.config(state='disabled', text="Capturing...")
@@ -258,44 +514,96 @@ class StudentRegistration:
         # Start auto capture process
         self.auto_capture_next_image()
     
+    def start_capture_pipeline(self):
+        """Start the detection stage of the auto-capture pipeline.
+        
+        capture thread -> detection thread -> writer pool: frames are grabbed, checked and
+        encoded concurrently, and the Tk thread only samples frames and records results.
+        """
+        self._pipeline_session += 1
+        self._frame_stack = None
+        self._detect_q = queue.Queue(maxsize=4)
+        thread = threading.Thread(target=self._detect_stage, args=(self._detect_q, self._pipeline_session), daemon=True)
+        thread.start()
+    
+    def stop_capture_pipeline(self):
+        """Tell the detection stage to exit once it has drained its queue"""
+        if self._detect_q is not None:
+            self._detect_q.put(None)
+            self._detect_q = None
+    
+    def _detect_stage(self, in_q, session):
+        """Quality-check sampled frames off the Tk thread and post each verdict back to it"""
+        while True:
+            frame = in_q.get()
+            if frame is None:
+                break
+            try:
+                reason = self.check_frame_quality(frame)
+            except Exception as e:
+                reason = f"Capture error: {str(e)}"
+            self.root.after(0, self.on_frame_checked, session, frame, reason)
+    
     def auto_capture_next_image(self):
-        """Capture next image in auto capture sequence"""
+        """Send the newest frame to the detection stage"""
         if not self.auto_capture_active or self.capture_count >= self.max_images:
             self.finish_auto_capture()
             return
         
-        if not self.camera or not self.is_capturing:
+        if not self.camera or not self.is_capturing or self._detect_q is None:
             self.finish_auto_capture()
             return
         
+        # Get current frame from the capture thread
+        frame = self.current_frame()
+        if frame is None:
+            self.status_var.set("Failed to capture frame")
+            self.finish_auto_capture()
+            return
+        
+        self._detect_q.put(frame)
+    
+    def on_frame_checked(self, session, frame, reason):
+        """Record a checked frame: queue it for writing or retry after a rejection"""
+        if session != self._pipeline_session or not self.auto_capture_active:
+            return  # Verdict from a finished session
+        
         try:
-            # Get current frame
-            ret, frame = self.camera.read()
-            if ret:
-                # Create role-based directory
-                roll_number = self.roll_var.get().strip()
-                role = self.role_var.get().strip()
-                student_dir = self.create_role_based_directory(roll_number, role)
-                
-                # Save image with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                image_path = os.path.join(student_dir, f"image_{self.capture_count + 1:02d}_{timestamp}.jpg")
-                cv2.imwrite(image_path, frame)
-                self.captured_images.append(image_path)
-                
-                # Update progress
-                self.capture_count += 1
-                self.images_var.set(f"Images captured: {self.capture_count}/{self.max_images}")
-                self.status_var.set(f"Capturing image {self.capture_count}/{self.max_images}...")
-                
-                print(f"✅ Captured image {self.capture_count}: {image_path}")
-                
-                # Schedule next capture
-                self.root.after(self.capture_delay, self.auto_capture_next_image)
+            # Skip frames without a single sharp face and try again shortly
+            if reason:
+                self._rejected_frames += 1
+                if self._rejected_frames > self.max_rejected_frames:
+                    self.finish_auto_capture()
+                    self.status_var.set(f"Auto capture stopped after {self.capture_count} images: {reason}")
+                    return
+                self.status_var.set(reason)
+                self.root.after(100, self.auto_capture_next_image)
+                return
+            self._rejected_frames = 0
+            
+            # Role-based directory created at session start
+            student_dir = self._student_dir
+            
+            if self.save_frame_stack:
+                # Buffer the frame; the whole session is written once in finish_auto_capture
+                if self._frame_stack is None:
+                    self._frame_stack = np.empty((self.max_images,) + frame.shape, dtype=np.uint8)
+                self._frame_stack[self.capture_count] = frame
+                image_path = os.path.join(student_dir, 'frames.npy')
             else:
-                self.status_var.set("Failed to capture frame")
-                self.finish_auto_capture()
-                
+                # Save image with the session timestamp (the image number keeps names unique)
+                image_path = os.path.join(student_dir, f"image_{self.capture_count + 1:02d}_{self._session_ts}.jpg")
+                self.queue_image_write(image_path, frame)
+            self.captured_images.append(image_path)
+            
+            # Update progress
+            self.capture_count += 1
+            self.images_var.set(f"Images captured: {self.capture_count}/{self.max_images}")
+            self.status_var.set(f"Capturing image {self.capture_count}/{self.max_images}...")
+            
+            # Schedule next capture
+            self.root.after(self.capture_delay, self.auto_capture_next_image)
+            
         except Exception as e:
             print(f"Error during auto capture: {e}")
             self.status_var.set(f"Capture error: {str(e)}")
@@ -303,7 +611,16 @@ class StudentRegistration:
     
     def finish_auto_capture(self):
         """Finish auto capture process"""
+        if self.auto_capture_active and self.captured_images:
+            print(f"✅ Captured {len(self.captured_images)} images to {self._student_dir}")
         self.auto_capture_active = False
+        self.stop_capture_pipeline()
+        
+        if self._frame_stack is not None and self.capture_count:
+            stack_path = os.path.join(self._student_dir, 'frames.npy')
+            self.pending_writes.append(self.writer_pool.submit(
+                self._write_frame_stack, stack_path, self._frame_stack[:self.capture_count]))
+            self._frame_stack = None
         
         # Re-enable buttons
         if self.is_capturing:
@@ -331,26 +648,22 @@ class StudentRegistration:
             return
         
         try:
-            # Get current frame
-            ret, frame = self.camera.read()
-            if ret:
-                # Create role-based directory
-                roll_number = self.roll_var.get().strip()
-                role = self.role_var.get().strip()
-                student_dir = self.create_role_based_directory(roll_number, role)
+            # Get current frame from the capture thread
+            frame = self.current_frame()
+            if frame is not None:
+                # Role-based directory (cached after the first capture)
+                student_dir = self.get_student_dir()
                 
                 # Save image with timestamp
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 image_count = len(self.captured_images) + 1
                 image_path = os.path.join(student_dir, f"image_{image_count:02d}_{timestamp}.jpg")
-                cv2.imwrite(image_path, frame)
+                self.queue_image_write(image_path, frame)
                 self.captured_images.append(image_path)
                 
                 # Update progress
                 self.images_var.set(f"Images captured: {len(self.captured_images)}/{self.max_images}")
                 self.status_var.set(f"Manual capture: {len(self.captured_images)} images saved")
-                
-                print(f"✅ Manual capture: {image_path}")
             else:
                 messagebox.showerror("Error", "Failed to capture frame from camera")
                 
@@ -366,11 +679,19 @@ class StudentRegistration:
         """Stop camera and clean up"""
         # Stop auto capture if active
         self.auto_capture_active = False
+        self.stop_capture_pipeline()
         
         self.is_capturing = False
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+        
+        # Let the capture thread leave camera.grab() before the camera is handed out again
+        if self.cap_thread is not None:
+            self.cap_thread.join(timeout=1.0)
+            self.cap_thread = None
+        
+        # The device handle stays open for a quick restart and is released once idle
+        self.camera = None
+        self._cancel_idle_release()
+        self._idle_release_id = self.root.after(self.camera_idle_release_ms, self.release_camera)
             
         self.start_btn.config(state='normal')
         self.capture_btn.config(state='disabled', text="Auto Capture (15 Images)")
@@ -379,6 +700,7 @@ class StudentRegistration:
         
         # Clear preview
         self.preview_label.configure(image='', text="Camera Stopped")
+        self._photo = None
         self.status_var.set("Camera stopped")
     
     def register_student(self):
@@ -393,20 +715,17 @@ class StudentRegistration:
             return
         
         try:
-            # Load existing students data
-            try:
-                with open('json_data/students.json', 'r') as f:
-                    students_data = json.load(f)
-            except FileNotFoundError:
-                students_data = {}
+            # Make sure every queued capture is on disk before the student is recorded
+            self.wait_for_writes()
             
             # Check if roll number already exists
             roll_number = self.roll_var.get().strip()
-            if roll_number in students_data:
+            if roll_number in self._students:
                 messagebox.showerror("Error", "Student with this roll number already exists")
                 return
             
             # Add new student with role information
+            students_data = dict(self._students)
             students_data[roll_number] = {
                 "name": self.name_var.get().strip(),
                 "roll": roll_number,
@@ -417,9 +736,9 @@ class StudentRegistration:
                 "image_folder": f"dataset/{self.role_var.get().strip().lower()}/{roll_number}"
             }
             
-            # Save updated data
-            with open('json_data/students.json', 'w') as f:
-                json.dump(students_data, f, indent=2)
+            # Save updated data (compact - the file is rewritten on every registration)
+            dump_json('json_data/students.json', students_data)
+            self._students = students_data
             
             # Show success message with role information
             role = self.role_var.get().strip()
@@ -448,10 +767,33 @@ class StudentRegistration:
         self.images_var.set("Images captured: 0/15")
         self.status_var.set("Form cleared - Ready for new registration")
     
+    def _cancel_idle_release(self):
+        """Cancel a pending idle release of the camera handle"""
+        if self._idle_release_id is not None:
+            self.root.after_cancel(self._idle_release_id)
+            self._idle_release_id = None
+    
+    def release_camera(self):
+        """Release the kept camera handle unless a capture is using it"""
+        self._idle_release_id = None
+        if self.camera is None and self._camera_handle is not None:
+            self._camera_handle.release()
+            self._camera_handle = None
+    
+    def _on_unmap(self, event):
+        """Window minimized or withdrawn: give the idle camera back to the other windows"""
+        if event.widget is self.root:
+            self._cancel_idle_release()
+            self.release_camera()
+    
     def on_closing(self):
         """Handle window closing"""
         try:
             self.stop_camera()
+            self._cancel_idle_release()
+            self.release_camera()
+            self.wait_for_writes()  # Finish writing queued captures
+            self.writer_pool.shutdown()
             image_manager.clear_all()  # Clear image references
             self.root.destroy()
         except Exception as e:
@@ -475,16 +817,10 @@ class StudentRegistration:
             return
         
         # Check if student already exists
-        try:
-            with open('json_data/students.json', 'r') as f:
-                students_data = json.load(f)
-            
-            roll_number = self.roll_var.get().strip()
-            if roll_number in students_data:
-                messagebox.showerror("Error", "Student with this roll number already exists")
-                return
-        except FileNotFoundError:
-            pass  # File doesn't exist yet, which is fine
+        roll_number = self.roll_var.get().strip()
+        if roll_number in self._students:
+            messagebox.showerror("Error", "Student with this roll number already exists")
+            return
         
         # Start the automatic workflow
         self.auto_workflow_active = True
@@ -500,7 +836,7 @@ class StudentRegistration:
         """Automatically start camera for the workflow"""
         try:
             self.workflow_var.set("📷 Starting camera...")
-            self.camera = cv2.VideoCapture(0)
+            self.camera = self.open_camera()
             
             if not self.camera.isOpened():
                 messagebox.showerror("Error", "Failed to open camera")
@@ -509,18 +845,26 @@ class StudentRegistration:
                 return
             
             self.is_capturing = True
+            self.start_capture_thread()
             self.camera_status_var.set("📹 Camera started - Preparing for capture...")
             
             self.update_camera_preview()
             
-            # Wait 2 seconds for camera to stabilize, then start auto capture
-            self.root.after(2000, self.auto_start_capture)
+            # Start auto capture as soon as the camera delivers a frame with a face
+            self.wait_for_first_frame(self.max_warmup_ms)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
             self.auto_workflow_active = False
             self.enable_form()
     
+    def wait_for_first_frame(self, remaining_ms):
+        """Poll for the capture thread's first-frame signal, giving up waiting after max_warmup_ms"""
+        if self._first_frame.is_set() or remaining_ms <= 0:
+            self.auto_start_capture()
+        else:
+            self.root.after(50, self.wait_for_first_frame, remaining_ms - 50)
+    
     def auto_start_capture(self):
         """Automatically start the capture process"""
         if not self.auto_workflow_active:
@@ -533,6 +877,10 @@ class StudentRegistration:
         self.auto_capture_active = True
         self.capture_count = 0
         self.captured_images = []
+        self.get_student_dir()  # Directory for the whole session, created up front
+        self._session_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._rejected_frames = 0
+        self.start_capture_pipeline()
         
         # Start auto capture process
         self.auto_capture_next_image()
@@ -5,6 +5,7 @@ Processes student images and creates face encodings
 """
 
 import os
+import sys
 import json
 import cv2
 import numpy as np
@@ -12,21 +13,365 @@ from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
+import queue
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from encoding_cache import save_encoding_cache
+from file_utils import atomic_write_json, load_json
 
 # Try to import face_recognition, handle gracefully if not available
 try:
     import face_recognition
+    from face_recognition import api as face_api
+    import dlib
     FACE_RECOGNITION_AVAILABLE = True
 except ImportError:
     FACE_RECOGNITION_AVAILABLE = False
     print("⚠️  face_recognition not available - training will be simulated")
 
+# PyTurboJPEG is optional - decodes JPEGs straight to RGB with libjpeg-turbo's SIMD paths
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    TURBOJPEG = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    TURBOJPEG_AVAILABLE = False
+
+# Images per batched encoder call
+ENCODE_BATCH_SIZE = 32
+
+# Faces are detected on a copy no larger than this; encodings still use the full-size image
+DETECT_MAX_SIDE = 640
+
+# Haar pre-check runs on a copy no larger than this; images it finds no face in skip dlib
+PRECHECK_MAX_SIDE = 240
+
+# Image types picked up from a student's directory
+IMAGE_EXTENSIONS = frozenset(('jpg', 'jpeg', 'png'))
+
+# Per-image encodings from earlier runs, keyed by path + mtime + size; a NaN row means "no face"
+IMAGE_CACHE_FILE = 'json_data/.encoding_cache.npz'
+# Append-only checkpoint of students finished in an interrupted run, merged on the next start
+IMAGE_CACHE_LOG = 'json_data/.encoding_cache.log'
+NO_FACE = np.full(128, np.nan, dtype=np.float32)
+# An +inf row means only the Haar pre-check rejected the image; the next run lets dlib decide
+PRECHECK_MISS = np.full(128, np.inf, dtype=np.float32)
+
+# CascadeClassifier is not thread-safe, so each loader thread keeps its own
+_precheck = threading.local()
+
+def has_face_candidate(image):
+    """Cheap Haar pass on a small grayscale copy: False only when it is sure there is no face"""
+    cascade = getattr(_precheck, 'cascade', None)
+    if cascade is None:
+        cascade = _precheck.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    if cascade.empty():
+        return True  # No cascade file - leave everything to dlib
+    
+    height, width = image.shape[:2]
+    scale = min(PRECHECK_MAX_SIDE / max(height, width), 1.0)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    if scale < 1:
+        gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    # Lenient settings: a false positive only costs a dlib pass, a miss defers the image to the next run
+    return len(cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=2, minSize=(20, 20))) > 0
+
+def worker_context():
+    """fork on Linux, so workers inherit the dlib models face_recognition.api loaded at import
+    copy-on-write; elsewhere the platform default (spawn on macOS, where fork is unsafe with Tk loaded)"""
+    if sys.platform.startswith('linux'):
+        return multiprocessing.get_context('fork')
+    return None
+
+def int8_storage_enabled():
+    """Whether recognition_config.json asks for an int8 copy of the encodings (float32 only by default)"""
+    try:
+        return bool(load_json('json_data/recognition_config.json').get('store_int8_encodings', False))
+    except Exception:
+        return False
+
+def image_cache_key(path, suffix=''):
+    """Cache key that changes whenever the file is rewritten"""
+    stat = os.stat(path)
+    return f"{path}{suffix}|{stat.st_mtime_ns}|{stat.st_size}"
+
+def load_image_cache():
+    """Cached per-image encodings grouped by roll number: {roll: {key: encoding}}"""
+    cache = {}
+    try:
+        with np.load(IMAGE_CACHE_FILE) as data:
+            for roll, key, vec in zip(data['rolls'], data['keys'], data['vecs']):
+                cache.setdefault(str(roll), {})[str(key)] = vec
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable encoding cache: {e}")
+    
+    # Students checkpointed by a run that did not finish
+    try:
+        with open(IMAGE_CACHE_LOG, 'rb') as f:
+            while True:
+                try:
+                    roll, keys, vecs = np.load(f), np.load(f), np.load(f)
+                except EOFError:
+                    break  # End of the log
+                except ValueError as e:
+                    # np.load's error for a short header or data block - the record a crash cut short
+                    print(f"⚠️  Dropping a truncated record at the end of the encoding checkpoint: {e}")
+                    break
+                if roll.shape != (1,) or vecs.shape != (len(keys), 128):
+                    raise ValueError(f"malformed record (shapes {roll.shape}, {keys.shape}, {vecs.shape})")
+                cache.setdefault(str(roll[0]), {}).update(zip(map(str, keys), vecs))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️  Ignoring the rest of the encoding checkpoint: {e}")
+    return cache
+
+def append_image_cache(log_file, roll, entries):
+    """Append one student's entries to the checkpoint log - O(student) per call, flushed right away"""
+    np.save(log_file, np.array([roll], dtype=str))
+    np.save(log_file, np.array(list(entries), dtype=str))
+    np.save(log_file, np.array(list(entries.values()), dtype=np.float32).reshape(-1, 128))
+    log_file.flush()
+
+def save_image_cache(cache):
+    """Write {roll: {key: encoding}} back to the cache file (temp file + os.replace)"""
+    rolls = [roll for roll, entries in cache.items() for _ in entries]
+    keys = [key for entries in cache.values() for key in entries]
+    vecs = [vec for entries in cache.values() for vec in entries.values()]
+    
+    tmp_path = IMAGE_CACHE_FILE + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, rolls=np.array(rolls, dtype=str), keys=np.array(keys, dtype=str),
+                            vecs=np.array(vecs, dtype=np.float32).reshape(-1, 128))
+    os.replace(tmp_path, IMAGE_CACHE_FILE)
+
+def detect_faces(image):
+    """HOG face boxes as (top, right, bottom, left), calling dlib's detector without the wrappers"""
+    height, width = image.shape[:2]
+    return [(max(rect.top(), 0), min(rect.right(), width), min(rect.bottom(), height), max(rect.left(), 0))
+            for rect in face_api.face_detector(image, 1)]
+
+def load_and_detect(source, precheck=True):
+    """Load one image (a file path or a BGR frame) and find its faces: (image, face_locations, error).
+    
+    face_locations is None when the Haar pre-check rejected the image without running dlib.
+    """
+    try:
+        # Load image: JPEGs through turbojpeg when available, otherwise OpenCV's decoder (faster
+        # than PIL); stacked frames are already BGR arrays
+        if isinstance(source, str) and TURBOJPEG_AVAILABLE and source.lower().endswith(('.jpg', '.jpeg')):
+            with open(source, 'rb') as f:
+                image = TURBOJPEG.decode(f.read(), pixel_format=TJPF_RGB)
+        else:
+            if isinstance(source, str):
+                bgr = cv2.imread(source, cv2.IMREAD_COLOR)
+                if bgr is None:
+                    return None, None, ValueError("could not decode image")
+            else:
+                bgr = np.ascontiguousarray(source)
+            image = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        
+        if precheck and not has_face_candidate(image):
+            return image, None, None
+        
+        # Find face locations on a downscaled copy (detection cost scales with pixel count),
+        # then map the boxes back so the encoder crops from the full-resolution image
+        height, width = image.shape[:2]
+        scale = DETECT_MAX_SIDE / max(height, width)
+        if scale >= 1:
+            return image, detect_faces(image), None
+        
+        small = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        face_locations = [(max(int(top / scale), 0), min(int(right / scale), width),
+                           min(int(bottom / scale), height), max(int(left / scale), 0))
+                          for top, right, bottom, left in detect_faces(small)]
+        return image, face_locations, None
+    except Exception as e:
+        return None, None, e
+
+def prefetch_map(executor, fn, items, depth):
+    """Like executor.map, but with at most depth items in flight so decoded images never pile up"""
+    in_flight = deque()
+    for item in items:
+        in_flight.append(executor.submit(fn, item))
+        if len(in_flight) >= depth:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def batch_face_encodings(images, face_locations_list):
+    """Encode the first face of each image with batched encoder calls; returns an (n, 128) float32 array.
+    
+    Same landmarks (5-point) and jitter as face_recognition.face_encodings, so the encodings match
+    the ones computed at recognition time.
+    """
+    encodings = []
+    for start in range(0, len(images), ENCODE_BATCH_SIZE):
+        batch = images[start:start + ENCODE_BATCH_SIZE]
+        batch_shapes = []
+        for image, face_locations in zip(batch, face_locations_list[start:start + ENCODE_BATCH_SIZE]):
+            shapes = dlib.full_object_detections()
+            top, right, bottom, left = face_locations[0]
+            shapes.append(face_api.pose_predictor_5_point(image, dlib.rectangle(left, top, right, bottom)))
+            batch_shapes.append(shapes)
+        
+        try:
+            descriptors = face_api.face_encoder.compute_face_descriptor(batch, batch_shapes, 1)
+            encodings.extend(face_descriptors[0] for face_descriptors in descriptors)
+        except (TypeError, RuntimeError):
+            # Older dlib builds have no batch overload
+            encodings.extend(face_recognition.face_encodings(image, face_locations[:1])[0]
+                             for image, face_locations in zip(batch, face_locations_list[start:start + ENCODE_BATCH_SIZE]))
+    
+    return np.array(encodings, dtype=np.float32).reshape(-1, 128)
+
+def encode_student(roll_number, student_info, cache=None):
+    """Encode one student's images in a worker process.
+    
+    cache holds this student's entries from the image cache; images whose key is in it are not
+    re-encoded. Returns (roll_number, encodings, log messages, updated cache entries).
+    """
+    messages = []
+    cache = cache or {}
+    new_cache = {}
+    student_name = student_info['name']
+    
+    # Check for role-based directory structure first
+    role = student_info.get('role', 'student').lower()
+    role_based_dir = f"dataset/{role}/{roll_number}"
+    legacy_dir = f"dataset/{roll_number}"
+    
+    # Determine which directory to use
+    if os.path.exists(role_based_dir):
+        student_dir = role_based_dir
+        messages.append(f"Using role-based directory: {role_based_dir}")
+    elif os.path.exists(legacy_dir):
+        student_dir = legacy_dir
+        messages.append(f"Using legacy directory: {legacy_dir}")
+    else:
+        messages.append(f"WARNING: No directory found for {student_name}")
+        return roll_number, None, messages, new_cache
+    
+    messages.append(f"Processing {role.title()}: {student_name} ({roll_number})")
+    
+    # Get all image files, plus the frames.npy stack registration can save instead of JPEGs
+    with os.scandir(student_dir) as entries:
+        image_files = [entry.name for entry in entries
+                       if entry.name.rpartition('.')[2].lower() in IMAGE_EXTENSIONS and entry.is_file()]
+    sources = []
+    for f in image_files:
+        image_path = os.path.join(student_dir, f)
+        sources.append((f, image_path, image_cache_key(image_path)))
+    
+    frames_path = os.path.join(student_dir, 'frames.npy')
+    if os.path.exists(frames_path):
+        frames = np.load(frames_path, mmap_mode='r')
+        sources.extend((f"frames.npy[{i}]", frames[i], image_cache_key(frames_path, f"[{i}]"))
+                       for i in range(len(frames)))
+    
+    if not sources:
+        messages.append(f"WARNING: No images found for {student_name}")
+        return roll_number, None, messages, new_cache
+    
+    messages.append(f"Found {len(sources)} images for {student_name}")
+    
+    # Only images that are new or changed since the last run need detection and encoding
+    pending = []
+    for image_file, source, key in sources:
+        cached = cache.get(key)
+        if cached is None:
+            pending.append((image_file, source, key, True))
+        elif np.isposinf(cached[0]):
+            pending.append((image_file, source, key, False))  # Pre-check miss - dlib gets its pass now
+        else:
+            new_cache[key] = cached
+    if len(pending) < len(sources):
+        messages.append(f"Reusing cached encodings for {len(sources) - len(pending)} unchanged images")
+    
+    # Detect faces per image, then encode detected faces in batches
+    images = []
+    images_face_locations = []
+    image_keys = []
+    
+    def encode_batch():
+        """Encode the collected images and release them"""
+        try:
+            new_cache.update(zip(image_keys, batch_face_encodings(images, images_face_locations)))
+        except Exception as e:
+            messages.append(f"ERROR encoding faces for {student_name}: {str(e)}")
+        images.clear()
+        images_face_locations.clear()
+        image_keys.clear()
+    
+    # Decoding and detection release the GIL, so images are loaded on a thread pool that runs
+    # ahead of the encoder: the next images are read and detected while a batch is encoded
+    workers = min(4, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = prefetch_map(executor, lambda item: load_and_detect(*item),
+                               [(source, precheck) for _, source, _, precheck in pending], 2 * workers)
+        
+        for (image_file, _, key, _), (image, face_locations, error) in zip(pending, results):
+            if error is not None:
+                messages.append(f"ERROR processing {image_file}: {str(error)}")
+                continue
+            
+            if face_locations is None:
+                # Not cached as NO_FACE: a frontal cascade misses turned heads, so dlib re-checks next run
+                messages.append(f"WARNING: No face candidate in {image_file} (rechecked with dlib next run)")
+                new_cache[key] = PRECHECK_MISS
+                continue
+            
+            if len(face_locations) == 0:
+                messages.append(f"WARNING: No face found in {image_file}")
+                new_cache[key] = NO_FACE
+                continue
+            
+            if len(face_locations) > 1:
+                messages.append(f"WARNING: Multiple faces in {image_file}, using first one")
+            
+            images.append(image)
+            images_face_locations.append(face_locations)
+            image_keys.append(key)
+            messages.append(f"Successfully processed {image_file}")
+            
+            # Get face encodings
+            if len(images) >= ENCODE_BATCH_SIZE:
+                encode_batch()
+    
+    if images:
+        encode_batch()
+    
+    # Cached and new encodings in image order, written into one preallocated float32 block
+    student_encodings = np.empty((len(sources), 128), dtype=np.float32)
+    count = 0
+    for _, _, key in sources:
+        encoding = new_cache.get(key)
+        if encoding is not None and np.isfinite(encoding[0]):
+            student_encodings[count] = encoding
+            count += 1
+    student_encodings = student_encodings[:count]
+    
+    if count:
+        messages.append(f"Generated {len(student_encodings)} encodings for {student_name}")
+    else:
+        messages.append(f"ERROR: No valid encodings generated for {student_name}")
+    
+    return roll_number, student_encodings, messages, new_cache
+
 class ModelTrainer:
     def __init__(self, root=None):
         self.root = root
         self.progress_var = None
         self.status_var = None
         self.progress_bar = None
+        self.log_text = None
+        self.train_btn = None
+        
+        # The training thread never touches Tk: it queues UI events and the main loop applies them
+        self._ui_queue = queue.Queue()
         
         if root:
             self.setup_gui()
@@ -93,26 +438,70 @@ class ModelTrainer:
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
         main_frame.rowconfigure(4, weight=1)
+        
+        self.root.after(50, self._drain_ui)
     
     def log_message(self, message):
         """Add message to log"""
-        if self.log_text:
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.log_text.see(tk.END)
-            self.root.update()
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.root:
+            self._ui_queue.put(('log', f"[{timestamp}] {message}\n"))
+        else:
+            print(f"[{timestamp}] {message}")
     
     def update_status(self, message):
         """Update status label"""
-        if self.status_var:
-            self.status_var.set(message)
-            self.root.update()
+        if self.root:
+            self._ui_queue.put(('status', message))
     
     def update_progress(self, value):
         """Update progress bar"""
-        if self.progress_var:
-            self.progress_var.set(value)
-            self.root.update()
+        if self.root:
+            self._ui_queue.put(('progress', value))
+    
+    def set_train_button_state(self, state):
+        """Enable or disable the Start Training button"""
+        if self.root:
+            self._ui_queue.put(('button', state))
+    
+    def show_dialog(self, kind, title, message):
+        """Show an info or error message box from any thread (kind is 'info' or 'error')"""
+        if self.root:
+            self._ui_queue.put((kind, (title, message)))
+    
+    def _drain_ui(self):
+        """Apply queued UI events on the Tk thread, every 50 ms"""
+        try:
+            log_lines = []
+            dialogs = []
+            while True:
+                try:
+                    kind, value = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'log':
+                    log_lines.append(value)
+                elif kind == 'status':
+                    self.status_var.set(value)
+                elif kind == 'progress':
+                    self.progress_var.set(value)
+                elif kind == 'button' and self.train_btn:
+                    self.train_btn.config(state=value)
+                elif kind in ('info', 'error'):
+                    dialogs.append((kind, value))
+            
+            # One insert and one scroll per tick however many lines arrived
+            if log_lines and self.log_text:
+                self.log_text.insert(tk.END, ''.join(log_lines))
+                self.log_text.see(tk.END)
+            
+            self.root.after(50, self._drain_ui)
+            
+            # Modal, so shown after the next tick is scheduled
+            for kind, (title, message) in dialogs:
+                (messagebox.showinfo if kind == 'info' else messagebox.showerror)(title, message)
+        except tk.TclError:
+            pass  # Window closed
     
     def start_training_thread(self):
         """Start training in a separate thread"""
@@ -137,7 +526,7 @@ class ModelTrainer:
             # Check if dataset directory exists
             if not os.path.exists('dataset'):
                 self.log_message("ERROR: Dataset directory not found!")
-                messagebox.showerror("Error", "Dataset directory not found. Please register students first.")
+                self.show_dialog('error', "Error", "Dataset directory not found. Please register students first.")
                 return
             
             # Load students data
@@ -146,12 +535,12 @@ class ModelTrainer:
                     students_data = json.load(f)
             except FileNotFoundError:
                 self.log_message("ERROR: No students data found!")
-                messagebox.showerror("Error", "No students data found. Please register students first.")
+                self.show_dialog('error', "Error", "No students data found. Please register students first.")
                 return
             
             if not students_data:
                 self.log_message("ERROR: No students registered!")
-                messagebox.showerror("Error", "No students registered. Please register students first.")
+                self.show_dialog('error', "Error", "No students registered. Please register students first.")
                 return
             
             self.log_message(f"Found {len(students_data)} registered students")
@@ -161,87 +550,61 @@ class ModelTrainer:
             total_students = len(students_data)
             processed_students = 0
             
-            # Process each student
-            for roll_number, student_info in students_data.items():
-                student_name = student_info['name']
-                
-                # Check for role-based directory structure first
-                role = student_info.get('role', 'student').lower()
-                role_based_dir = f"dataset/{role}/{roll_number}"
-                legacy_dir = f"dataset/{roll_number}"
-                
-                # Determine which directory to use
-                if os.path.exists(role_based_dir):
-                    student_dir = role_based_dir
-                    self.log_message(f"Using role-based directory: {role_based_dir}")
-                elif os.path.exists(legacy_dir):
-                    student_dir = legacy_dir
-                    self.log_message(f"Using legacy directory: {legacy_dir}")
-                else:
-                    self.log_message(f"WARNING: No directory found for {student_name}")
-                    continue
-                
-                self.log_message(f"Processing {role.title()}: {student_name} ({roll_number})")
-                self.update_status(f"Processing {student_name}...")
-                
-                # Get all image files
-                image_files = [f for f in os.listdir(student_dir) 
-                             if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-                
-                if not image_files:
-                    self.log_message(f"WARNING: No images found for {student_name}")
-                    continue
-                
-                self.log_message(f"Found {len(image_files)} images for {student_name}")
-                
-                # Process images and extract encodings
-                student_encodings = []
+            # Students are independent, so each one is encoded in its own worker process
+            # (half the cores - dlib uses a few threads of its own); logs are replayed here
+            # Images unchanged since the last run reuse their cached encodings
+            image_cache = load_image_cache()
+            new_image_cache = {}
+            
+            student_results = {}
+            with open(IMAGE_CACHE_LOG, 'ab') as checkpoint, \
+                 ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2),
+                                     mp_context=worker_context()) as pool:
+                futures = {pool.submit(encode_student, roll_number, student_info, image_cache.get(roll_number)): roll_number
+                           for roll_number, student_info in students_data.items()}
                 
-                for i, image_file in enumerate(image_files):
-                    image_path = os.path.join(student_dir, image_file)
-                    
+                for future in as_completed(futures):
+                    student_name = students_data[futures[future]]['name']
                     try:
-                        # Load image
-                        image = face_recognition.load_image_file(image_path)
-                        
-                        # Find face locations
-                        face_locations = face_recognition.face_locations(image)
-                        
-                        if len(face_locations) == 0:
-                            self.log_message(f"WARNING: No face found in {image_file}")
-                            continue
-                        
-                        if len(face_locations) > 1:
-                            self.log_message(f"WARNING: Multiple faces in {image_file}, using first one")
-                        
-                        # Get face encodings
-                        face_encodings = face_recognition.face_encodings(image, face_locations)
-                        
-                        if face_encodings:
-                            student_encodings.append(face_encodings[0].tolist())
-                            self.log_message(f"Successfully processed {image_file}")
-                        
+                        roll_number, student_encodings, messages, student_cache = future.result()
                     except Exception as e:
-                        self.log_message(f"ERROR processing {image_file}: {str(e)}")
-                        continue
-                
-                if student_encodings:
-                    encodings_data[roll_number] = student_encodings
-                    self.log_message(f"Generated {len(student_encodings)} encodings for {student_name}")
-                else:
-                    self.log_message(f"ERROR: No valid encodings generated for {student_name}")
-                
-                # Update progress
-                processed_students += 1
-                progress = (processed_students / total_students) * 100
-                self.update_progress(progress)
+                        roll_number, student_encodings, messages, student_cache = None, None, [f"ERROR processing {student_name}: {str(e)}"], None
+                    
+                    for message in messages:
+                        self.log_message(message)
+                    if student_encodings is not None and len(student_encodings):
+                        student_results[roll_number] = student_encodings
+                    if student_cache:
+                        new_image_cache[roll_number] = student_cache
+                        # Checkpoint now so an interrupted run resumes from here
+                        append_image_cache(checkpoint, roll_number, student_cache)
+                    
+                    # Update progress
+                    processed_students += 1
+                    progress = (processed_students / total_students) * 100
+                    self.update_status(f"Processed {student_name}")
+                    self.update_progress(progress)
+            
+            # Keep the students.json order in the saved file
+            encodings_data = {roll: student_results[roll] for roll in students_data if roll in student_results}
             
             # Save encodings to JSON file
             self.log_message("Saving encodings to file...")
             self.update_status("Saving encodings...")
             
-            with open('json_data/encodings.json', 'w') as f:
-                json.dump(encodings_data, f, indent=2)
+            # Compact, and serialized by orjson when it is installed; the metadata stays indented
+            atomic_write_json('json_data/encodings.json', encodings_data)
+            
+            # Float32 matrix next to the JSON so recognition can memory-map it instead of parsing,
+            # plus an int8 copy when the config enables it
+            save_encoding_cache('json_data', encodings_data, quantized=int8_storage_enabled())
+            
+            # Only images seen in this run are kept, so deleted images drop out of the cache
+            try:
+                save_image_cache(new_image_cache)
+                os.remove(IMAGE_CACHE_LOG)  # Folded into the cache file
+            except Exception as e:
+                self.log_message(f"WARNING: Could not write encoding cache: {str(e)}")
             
             # Add metadata
             metadata = {
@@ -261,23 +624,20 @@ class ModelTrainer:
             self.update_status("Training completed successfully!")
             self.update_progress(100)
             
-            if self.root:
-                messagebox.showinfo("Success", 
-                                  f"Model training completed!\n"
-                                  f"Students trained: {len(encodings_data)}\n"
-                                  f"Encodings generated: {metadata['total_encodings']}")
+            self.show_dialog('info', "Success",
+                             f"Model training completed!\n"
+                             f"Students trained: {len(encodings_data)}\n"
+                             f"Encodings generated: {metadata['total_encodings']}")
             
         except Exception as e:
             error_msg = f"Training failed: {str(e)}"
             self.log_message(f"ERROR: {error_msg}")
             self.update_status("Training failed!")
             
-            if self.root:
-                messagebox.showerror("Error", error_msg)
+            self.show_dialog('error', "Error", error_msg)
         
         finally:
-            if self.train_btn:
-                self.train_btn.config(state='normal')
+            self.set_train_button_state('normal')
     
     def create_dummy_encodings(self):
         """Create dummy face encodings for demonstration purposes"""
@@ -288,7 +648,7 @@ class ModelTrainer:
             
             if not students_data:
                 self.log_message("ERROR: No students registered!")
-                messagebox.showerror("Error", "No students registered. Please register students first.")
+                self.show_dialog('error', "Error", "No students registered. Please register students first.")
                 return
             
             self.log_message(f"Creating dummy encodings for {len(students_data)} students...")
@@ -298,17 +658,15 @@ class ModelTrainer:
             total_students = len(students_data)
             processed_students = 0
             
-            for roll_number, student_info in students_data.items():
+            # Random 128-dimensional encodings (dummy data), 5 per student, drawn in one call
+            per_student = 5
+            all_encodings = np.random.default_rng().random((total_students * per_student, 128), dtype=np.float32)
+            
+            for i, (roll_number, student_info) in enumerate(students_data.items()):
                 student_name = student_info['name']
                 self.log_message(f"Creating dummy encoding for: {student_name} ({roll_number})")
                 
-                # Create random 128-dimensional encodings (dummy data)
-                dummy_encodings = []
-                for i in range(5):  # Create 5 dummy encodings per student
-                    dummy_encoding = np.random.random(128).tolist()
-                    dummy_encodings.append(dummy_encoding)
-                
-                encodings_data[roll_number] = dummy_encodings
+                encodings_data[roll_number] = all_encodings[i * per_student:(i + 1) * per_student]
                 
                 # Update progress
                 processed_students += 1
@@ -317,8 +675,8 @@ class ModelTrainer:
                 self.update_status(f"Processing {student_name}...")
             
             # Save encodings
-            with open('json_data/encodings.json', 'w') as f:
-                json.dump(encodings_data, f, indent=2)
+            atomic_write_json('json_data/encodings.json', encodings_data)
+            save_encoding_cache('json_data', encodings_data, quantized=int8_storage_enabled())
             
             # Save metadata
             metadata = {
@@ -336,20 +694,18 @@ class ModelTrainer:
             self.update_status("Demo training completed!")
             self.update_progress(100)
             
-            if self.root:
-                messagebox.showinfo("Demo Training Complete", 
-                                  f"Demo training completed!\n"
-                                  f"Students: {len(encodings_data)}\n"
-                                  f"Dummy encodings: {metadata['total_encodings']}\n\n"
-                                  f"Install face_recognition library for real training.")
-                                  
+            self.show_dialog('info', "Demo Training Complete",
+                             f"Demo training completed!\n"
+                             f"Students: {len(encodings_data)}\n"
+                             f"Dummy encodings: {metadata['total_encodings']}\n\n"
+                             f"Install face_recognition library for real training.")
+            
         except Exception as e:
             error_msg = f"Demo training failed: {str(e)}"
             self.log_message(f"ERROR: {error_msg}")
             self.update_status("Demo training failed!")
             
-            if self.root:
-                messagebox.showerror("Error", error_msg)
+            self.show_dialog('error', "Error", error_msg)
 
 def main():
     """Main function for GUI mode"""
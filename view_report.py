@@ -6,11 +6,62 @@ View and export attendance reports from JSON files
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
 import os
-import pandas as pd
+import sys
+import csv
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 import calendar
+from file_utils import load_json, ZSTD_AVAILABLE
+import attendance_db
+
+# File manager command for this platform, resolved once at import
+if sys.platform == 'darwin':  # macOS
+    FOLDER_OPENER = ['open']
+elif sys.platform == 'win32':
+    FOLDER_OPENER = ['explorer']
+else:  # Linux
+    FOLDER_OPENER = ['xdg-open']
+
+# Treeview rows are materialized in batches of this size as the user scrolls toward the end
+TREE_BATCH_ROWS = 100
+
+def iso_date(d):
+    """YYYY-MM-DD for a date - an f-string skips strftime's locale-aware formatting"""
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+def _roll_sort_key(item):
+    """Numeric rolls in numeric order, then any other rolls alphabetically"""
+    roll = item[0]
+    return (0, int(roll), '') if roll.isdigit() else (1, 0, roll)
+
+def _set_if_changed(var, value):
+    """Set a Tk variable only when the text differs, so unchanged labels see no trace or redraw"""
+    value = str(value)
+    if var.get() != value:
+        var.set(value)
+
+def _read_if_changed(path, cached_mtime):
+    """Stat path and parse it unless its mtime_ns equals cached_mtime: (mtime_ns, data, or None if unchanged)"""
+    mtime = os.stat(path).st_mtime_ns
+    if mtime == cached_mtime:
+        return mtime, None
+    return mtime, load_json(path)
+
+def _day_file_path(date_str):
+    """Path of one day's attendance file - the compressed archive copy when there is one"""
+    path = f"attendance/{date_str}.json"
+    if ZSTD_AVAILABLE and os.path.exists(path + '.zst'):
+        return path + '.zst'
+    return path
+
+def _read_day_file(date_str):
+    """Parsed attendance for one day, or None if the file is missing or unreadable"""
+    try:
+        return load_json(_day_file_path(date_str))
+    except Exception:
+        return None
 
 class AttendanceReportViewer:
     def __init__(self, root):
@@ -21,8 +72,25 @@ class AttendanceReportViewer:
         
         # Variables
         self.students_data = {}
+        # (roll, student) pairs sorted by roll once per load; every view and the export use this order
+        self._sorted_students = []
         self.current_date = date.today()
+        self._current_date_str = iso_date(self.current_date)
         self.attendance_data = {}
+        # mtime_ns of the files behind students_data / attendance_data; unchanged files are not reparsed
+        self._students_mtime = None
+        self._attendance_key = None
+        self._present_rolls = frozenset()
+        self._absent_rolls = frozenset()
+        self._present_rows = []
+        self._absent_rows = []
+        # Tabs still showing an older date; each is refilled when it becomes visible
+        self._dirty = {'present': True, 'absent': True, 'all': True}
+        # Full row list per tree and how many of those rows are inserted so far
+        self._tree_rows = {}
+        self._tree_loaded = {}
+        # File reads, exports and the monthly report run here; results come back via root.after
+        self._io = ThreadPoolExecutor(max_workers=2)
         
         # Load students data
         self.load_students_data()
@@ -71,7 +139,7 @@ class AttendanceReportViewer:
         ttk.Label(date_frame, text="Select Date:", font=('Arial', 12, 'bold')).grid(row=0, column=0, padx=(0, 10))
         
         # Date entry
-        self.date_var = tk.StringVar(value=self.current_date.strftime("%Y-%m-%d"))
+        self.date_var = tk.StringVar(value=self._current_date_str)
         date_entry = ttk.Entry(date_frame, textvariable=self.date_var, font=('Arial', 11), width=12)
         date_entry.grid(row=0, column=1, padx=5)
         
@@ -122,6 +190,7 @@ class AttendanceReportViewer:
         # Create notebook for different views
         notebook = ttk.Notebook(parent)
         notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.notebook = notebook
         
         # Configure grid weights
         parent.columnconfigure(0, weight=1)
@@ -144,6 +213,9 @@ class AttendanceReportViewer:
         self.create_absent_view(absent_frame)
         self.create_all_students_view(all_frame)
         
+        # Only the visible tab is filled; the others catch up when selected
+        notebook.bind("<<NotebookTabChanged>>", self._refresh_visible_tab)
+        
     def create_present_view(self, parent):
         """Create present students view"""
         # Treeview for present students
@@ -165,7 +237,7 @@ class AttendanceReportViewer:
         # Scrollbars
         present_v_scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.present_tree.yview)
         present_h_scrollbar = ttk.Scrollbar(parent, orient="horizontal", command=self.present_tree.xview)
-        self.present_tree.configure(yscrollcommand=present_v_scrollbar.set, 
+        self.present_tree.configure(yscrollcommand=lambda first, last: self._on_tree_scroll(self.present_tree, present_v_scrollbar, first, last), 
                                   xscrollcommand=present_h_scrollbar.set)
         
         # Grid layout
@@ -198,7 +270,7 @@ class AttendanceReportViewer:
         # Scrollbars
         absent_v_scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.absent_tree.yview)
         absent_h_scrollbar = ttk.Scrollbar(parent, orient="horizontal", command=self.absent_tree.xview)
-        self.absent_tree.configure(yscrollcommand=absent_v_scrollbar.set, 
+        self.absent_tree.configure(yscrollcommand=lambda first, last: self._on_tree_scroll(self.absent_tree, absent_v_scrollbar, first, last), 
                                  xscrollcommand=absent_h_scrollbar.set)
         
         # Grid layout
@@ -233,7 +305,7 @@ class AttendanceReportViewer:
         # Scrollbars
         all_v_scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.all_tree.yview)
         all_h_scrollbar = ttk.Scrollbar(parent, orient="horizontal", command=self.all_tree.xview)
-        self.all_tree.configure(yscrollcommand=all_v_scrollbar.set, 
+        self.all_tree.configure(yscrollcommand=lambda first, last: self._on_tree_scroll(self.all_tree, all_v_scrollbar, first, last), 
                               xscrollcommand=all_h_scrollbar.set)
         
         # Grid layout
@@ -248,28 +320,73 @@ class AttendanceReportViewer:
     def load_students_data(self):
         """Load students data from JSON"""
         try:
-            with open('json_data/students.json', 'r') as f:
-                self.students_data = json.load(f)
-        except FileNotFoundError:
-            messagebox.showerror("Error", "Students data not found. Please register students first.")
-            self.students_data = {}
+            self._apply_students(_read_if_changed('json_data/students.json', self._students_mtime))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load students data: {str(e)}")
-            self.students_data = {}
+            self._apply_students(e)
     
-    def load_attendance_for_date(self, target_date):
-        """Load attendance data for specific date"""
-        date_str = target_date.strftime("%Y-%m-%d")
-        attendance_file = f"attendance/{date_str}.json"
-        
+    def _apply_students(self, result):
+        """Install a (mtime_ns, data) result from _read_if_changed, or report the exception it raised"""
+        if isinstance(result, FileNotFoundError):
+            messagebox.showerror("Error", "Students data not found. Please register students first.")
+        elif isinstance(result, Exception):
+            messagebox.showerror("Error", f"Failed to load students data: {str(result)}")
+        else:
+            mtime, data = result
+            if data is not None:
+                self.students_data = data
+                self._sorted_students = sorted(data.items(), key=_roll_sort_key)
+                self._students_mtime = mtime
+            return
+        self.students_data = {}
+        self._sorted_students = []
+        self._students_mtime = None
+    
+    def load_attendance_for_date(self, target_date, reload_students=False):
+        """Load attendance data for specific date (read in the background, shown on the Tk thread)"""
+        date_str = self._current_date_str = iso_date(target_date)
+        self._io.submit(self._read_report_files, date_str, reload_students)
+    
+    def _read_report_files(self, date_str, reload_students):
+        """Read students.json (if asked) and the day's file, skipping unchanged ones (runs in a worker thread)"""
+        students = None
+        if reload_students:
+            try:
+                students = _read_if_changed('json_data/students.json', self._students_mtime)
+            except Exception as e:
+                students = e
+        
+        attendance_file = _day_file_path(date_str)
+        cached_mtime = self._attendance_key[1] if self._attendance_key and self._attendance_key[0] == attendance_file else None
         try:
-            with open(attendance_file, 'r') as f:
-                self.attendance_data = json.load(f)
-        except FileNotFoundError:
-            self.attendance_data = {}
+            attendance = _read_if_changed(attendance_file, cached_mtime)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load attendance data: {str(e)}")
+            attendance = e
+        
+        self.root.after(0, self._apply_report_files, date_str, students, attendance_file, attendance)
+    
+    def _apply_report_files(self, date_str, students, attendance_file, attendance):
+        """Install freshly read data and update the displays"""
+        if date_str != self._current_date_str:
+            return  # Another date was requested while this one was loading
+        if students is not None:
+            self._apply_students(students)
+        
+        if isinstance(attendance, FileNotFoundError):
             self.attendance_data = {}
+            self._attendance_key = None
+        elif isinstance(attendance, Exception):
+            messagebox.showerror("Error", f"Failed to load attendance data: {str(attendance)}")
+            self.attendance_data = {}
+            self._attendance_key = None
+        else:
+            mtime, data = attendance
+            if data is not None:
+                self.attendance_data = data
+                self._attendance_key = (attendance_file, mtime)
+        
+        # Split the roster once with set operations; the views and statistics reuse these
+        self._present_rolls = frozenset(self.students_data.keys() & self.attendance_data.keys())
+        self._absent_rolls = frozenset(self.students_data.keys() - self.attendance_data.keys())
         
         # Update displays
         self.update_statistics()
@@ -278,14 +395,14 @@ class AttendanceReportViewer:
     def load_today(self):
         """Load today's attendance"""
         self.current_date = date.today()
-        self.date_var.set(self.current_date.strftime("%Y-%m-%d"))
+        _set_if_changed(self.date_var, iso_date(self.current_date))
         self.load_attendance_for_date(self.current_date)
         
     def load_yesterday(self):
         """Load yesterday's attendance"""
         yesterday = date.today() - timedelta(days=1)
         self.current_date = yesterday
-        self.date_var.set(self.current_date.strftime("%Y-%m-%d"))
+        _set_if_changed(self.date_var, iso_date(self.current_date))
         self.load_attendance_for_date(self.current_date)
         
     def load_selected_date(self):
@@ -300,50 +417,78 @@ class AttendanceReportViewer:
     def update_statistics(self):
         """Update statistics display"""
         total_students = len(self.students_data)
-        present_count = len(self.attendance_data)
-        absent_count = total_students - present_count
+        present_count = len(self._present_rolls)
+        absent_count = len(self._absent_rolls)
         
         if total_students > 0:
             attendance_rate = (present_count / total_students) * 100
         else:
             attendance_rate = 0
         
-        self.total_students_var.set(f"Total Students: {total_students}")
-        self.present_count_var.set(f"Present: {present_count}")
-        self.absent_count_var.set(f"Absent: {absent_count}")
-        self.attendance_rate_var.set(f"Attendance Rate: {attendance_rate:.1f}%")
+        _set_if_changed(self.total_students_var, f"Total Students: {total_students}")
+        _set_if_changed(self.present_count_var, f"Present: {present_count}")
+        _set_if_changed(self.absent_count_var, f"Absent: {absent_count}")
+        _set_if_changed(self.attendance_rate_var, f"Attendance Rate: {attendance_rate:.1f}%")
         
     def update_report_displays(self):
         """Update all report displays"""
-        # Clear existing data
-        for tree in [self.present_tree, self.absent_tree, self.all_tree]:
-            for item in tree.get_children():
-                tree.delete(item)
-        
-        # Present students
-        for roll, attendance_info in self.attendance_data.items():
-            if roll in self.students_data:
-                student = self.students_data[roll]
-                self.present_tree.insert('', tk.END, values=(
-                    roll, student['name'], student['department'], attendance_info['time']
-                ))
-                
-                # Add to all students view
-                self.all_tree.insert('', tk.END, values=(
-                    roll, student['name'], student['department'], 'Present', attendance_info['time']
-                ))
-        
-        # Absent students
-        for roll, student in self.students_data.items():
-            if roll not in self.attendance_data:
-                self.absent_tree.insert('', tk.END, values=(
-                    roll, student['name'], student['department'], 'Absent'
-                ))
-                
-                # Add to all students view
-                self.all_tree.insert('', tk.END, values=(
-                    roll, student['name'], student['department'], 'Absent', '--'
-                ))
+        # Build the row tuples once; the trees are filled from these
+        # Present rows keep the order attendance was marked in; absent rows follow the roll order
+        students = self.students_data
+        present_rolls = self._present_rolls
+        absent_rolls = self._absent_rolls
+        self._present_rows = [(roll, student['name'], student['department'], attendance_info['time'])
+                              for roll, attendance_info in self.attendance_data.items() if roll in present_rolls
+                              for student in (students[roll],)]
+        self._absent_rows = [(roll, student['name'], student['department'])
+                             for roll, student in self._sorted_students if roll in absent_rolls]
+        
+        for tab in self._dirty:
+            self._dirty[tab] = True
+        self._refresh_visible_tab()
+    
+    def _refresh_visible_tab(self, event=None):
+        """Fill the selected tab's tree if it is out of date"""
+        tab = ('present', 'absent', 'all')[self.notebook.index(self.notebook.select())]
+        if not self._dirty[tab]:
+            return
+        {'present': self._fill_present, 'absent': self._fill_absent, 'all': self._fill_all}[tab]()
+        self._dirty[tab] = False
+    
+    def _fill_present(self):
+        """Refill the present students tree"""
+        self._fill_tree(self.present_tree, self._present_rows)
+    
+    def _fill_absent(self):
+        """Refill the absent students tree"""
+        self._fill_tree(self.absent_tree, [(roll, name, department, 'Absent') for roll, name, department in self._absent_rows])
+    
+    def _fill_all(self):
+        """Refill the all students tree (present first, then absent)"""
+        self._fill_tree(self.all_tree, [(roll, name, department, 'Present', time) for roll, name, department, time in self._present_rows] +
+                                       [(roll, name, department, 'Absent', '--') for roll, name, department in self._absent_rows])
+    
+    def _fill_tree(self, tree, rows):
+        """Replace a tree's rows; only the first batch goes into Tk now, the rest follow on scroll"""
+        tree.delete(*tree.get_children())
+        self._tree_rows[tree] = rows
+        self._tree_loaded[tree] = 0
+        self._load_more_rows(tree)
+    
+    def _load_more_rows(self, tree):
+        """Insert the next TREE_BATCH_ROWS rows of a tree"""
+        start = self._tree_loaded[tree]
+        insert = tree.insert
+        end = tk.END
+        for values in self._tree_rows[tree][start:start + TREE_BATCH_ROWS]:
+            insert('', end, values=values)
+        self._tree_loaded[tree] = min(start + TREE_BATCH_ROWS, len(self._tree_rows[tree]))
+    
+    def _on_tree_scroll(self, tree, scrollbar, first, last):
+        """yscrollcommand: move the scrollbar and append rows once the view nears the end of what is inserted"""
+        scrollbar.set(first, last)
+        if float(last) > 0.9 and self._tree_loaded.get(tree, 0) < len(self._tree_rows.get(tree, ())):
+            self._load_more_rows(tree)
     
     def export_to_csv(self):
         """Export attendance data to CSV"""
@@ -355,112 +500,116 @@ class AttendanceReportViewer:
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialname=f"attendance_{self.current_date.strftime('%Y-%m-%d')}.csv"
+            initialname=f"attendance_{self._current_date_str}.csv"
         )
         
         if not filename:
             return
         
+        # Write in the background so a large roster doesn't freeze the window
+        self._io.submit(self._write_csv, filename, self._sorted_students, self.attendance_data, self._current_date_str)
+    
+    def _write_csv(self, filename, sorted_students, attendance_data, date_str):
+        """Stream one CSV row per student (runs in a worker thread)"""
         try:
-            # Prepare data for export
-            export_data = []
-            
-            for roll, student in self.students_data.items():
-                if roll in self.attendance_data:
-                    # Present student
-                    export_data.append({
-                        'Roll Number': roll,
-                        'Name': student['name'],
-                        'Department': student['department'],
-                        'Status': 'Present',
-                        'Time': self.attendance_data[roll]['time'],
-                        'Date': self.current_date.strftime("%Y-%m-%d")
-                    })
-                else:
-                    # Absent student
-                    export_data.append({
-                        'Roll Number': roll,
-                        'Name': student['name'],
-                        'Department': student['department'],
-                        'Status': 'Absent',
-                        'Time': '--',
-                        'Date': self.current_date.strftime("%Y-%m-%d")
-                    })
+            # 1 MiB buffer so a long export is a handful of write syscalls, not one per row
+            with open(filename, 'w', newline='', buffering=1 << 20) as f:
+                # Plain tuples in header order - no dict built and re-read per student
+                writer = csv.writer(f)
+                writer.writerow(('Roll Number', 'Name', 'Department', 'Status', 'Time', 'Date'))
+                writer.writerows(
+                    (roll, student['name'], student['department'], 'Present', attendance_data[roll]['time'], date_str)
+                    if roll in attendance_data else
+                    (roll, student['name'], student['department'], 'Absent', '--', date_str)
+                    for roll, student in sorted_students
+                )
             
-            # Create DataFrame and save
-            df = pd.DataFrame(export_data)
-            df.to_csv(filename, index=False)
-            
-            messagebox.showinfo("Success", f"Attendance data exported to {filename}")
+            self.root.after(0, messagebox.showinfo, "Success", f"Attendance data exported to {filename}")
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+            self.root.after(0, messagebox.showerror, "Error", f"Failed to export data: {str(e)}")
     
     def show_monthly_report(self):
         """Show monthly attendance report"""
         # This would open a new window with monthly statistics
         # For now, just show a simple summary
+        # File reads happen in the background; the dialog is posted back to the Tk thread
+        self._io.submit(self._monthly_report_worker, self.current_date, len(self.students_data))
+    
+    def _monthly_report_worker(self, report_date, total_students):
+        """Count the month's attendance files and post the summary (runs in a worker thread)"""
         try:
-            current_month = self.current_date.replace(day=1)
+            current_month = report_date.replace(day=1)
             month_name = calendar.month_name[current_month.month]
             year = current_month.year
             
-            # Count attendance files for the month
-            attendance_days = 0
-            total_present = 0
+            last_day = calendar.monthrange(year, current_month.month)[1]
+            first = iso_date(current_month)
+            last = iso_date(current_month.replace(day=last_day))
             
-            for day in range(1, 32):
+            # This month's day files and their mtimes, from one directory read
+            # (archived days are YYYY-MM-DD.json.zst)
+            suffixes = ('.json', '.json.zst') if ZSTD_AVAILABLE else ('.json',)
+            file_mtimes = {}
+            try:
+                with os.scandir("attendance") as entries:
+                    for entry in entries:
+                        date_str, dot, suffix = entry.name.partition('.')
+                        if dot + suffix in suffixes and first <= date_str <= last:
+                            file_mtimes[date_str] = max(entry.stat().st_mtime_ns, file_mtimes.get(date_str, 0))
+            except FileNotFoundError:
+                pass
+            
+            counts = {}
+            if file_mtimes:
+                conn = attendance_db.connect("attendance")
                 try:
-                    check_date = current_month.replace(day=day)
-                    if check_date.month != current_month.month:
-                        break
-                        
-                    attendance_file = f"attendance/{check_date.strftime('%Y-%m-%d')}.json"
-                    if os.path.exists(attendance_file):
-                        attendance_days += 1
-                        with open(attendance_file, 'r') as f:
-                            day_attendance = json.load(f)
-                            total_present += len(day_attendance)
-                            
-                except ValueError:
-                    break  # Invalid date (e.g., Feb 30)
-                except Exception:
-                    continue
+                    # Only files changed since the last report are parsed - small I/O-bound reads, so
+                    # overlap them across a few threads
+                    stale = attendance_db.stale_days(conn, file_mtimes)
+                    with ThreadPoolExecutor(max_workers=8) as executor:
+                        results = list(executor.map(_read_day_file, stale))
+                    
+                    unreadable = set()
+                    for date_str, records in zip(stale, results):
+                        if not isinstance(records, dict):
+                            unreadable.add(date_str)
+                        else:
+                            attendance_db.import_day(conn, date_str, file_mtimes[date_str], records)
+                    
+                    # Deleted or unreadable files drop out; then the whole month is one grouped query
+                    attendance_db.forget_days(conn, first, last, file_mtimes.keys() - unreadable)
+                    counts = attendance_db.day_counts(conn, first, last)
+                finally:
+                    conn.close()
+            
+            # Count attendance files for the month
+            attendance_days = len(counts)
+            total_present = sum(counts.values())
             
             avg_attendance = total_present / attendance_days if attendance_days > 0 else 0
             
-            messagebox.showinfo("Monthly Report", 
-                              f"Monthly Report for {month_name} {year}\n\n"
-                              f"Days with attendance records: {attendance_days}\n"
-                              f"Total attendance marks: {total_present}\n"
-                              f"Average daily attendance: {avg_attendance:.1f}\n"
-                              f"Total registered students: {len(self.students_data)}")
+            self.root.after(0, messagebox.showinfo, "Monthly Report",
+                            f"Monthly Report for {month_name} {year}\n\n"
+                            f"Days with attendance records: {attendance_days}\n"
+                            f"Total attendance marks: {total_present}\n"
+                            f"Average daily attendance: {avg_attendance:.1f}\n"
+                            f"Total registered students: {total_students}")
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate monthly report: {str(e)}")
+            self.root.after(0, messagebox.showerror, "Error", f"Failed to generate monthly report: {str(e)}")
     
     def open_attendance_folder(self):
         """Open attendance folder in file explorer"""
         try:
-            import subprocess
-            import platform
-            
-            attendance_path = os.path.abspath("attendance")
-            
-            if platform.system() == "Darwin":  # macOS
-                subprocess.call(["open", attendance_path])
-            elif platform.system() == "Windows":
-                subprocess.call(["explorer", attendance_path])
-            else:  # Linux
-                subprocess.call(["xdg-open", attendance_path])
-                
+            # Popen, not call - the file manager can stay open without blocking the window
+            subprocess.Popen(FOLDER_OPENER + [os.path.abspath("attendance")])
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open folder: {str(e)}")
     
     def refresh_data(self):
         """Refresh all data"""
-        self.load_students_data()
-        self.load_attendance_for_date(self.current_date)
+        self.load_attendance_for_date(self.current_date, reload_students=True)
 
 def main():
     root = tk.Tk()